@@ -0,0 +1,83 @@
+import json
+import time
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+
+def batch_request(custom_id, prompt, max_tokens, model, temperature=0.0):
+    """One line of a Batch API input file, the same request get_response sends synchronously."""
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": BATCH_ENDPOINT,
+        "body": {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "max_tokens": max_tokens,
+            "temperature": temperature,
+        },
+    }
+
+
+def write_jsonl(records, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(json.dumps(record, ensure_ascii=False))
+            file.write("\n")
+
+
+def submit_batch(client, requests_path, completion_window="24h"):
+    with open(requests_path, 'rb') as file:
+        uploaded = client.files.create(file=file, purpose="batch")
+    batch = client.batches.create(input_file_id=uploaded.id, endpoint=BATCH_ENDPOINT,
+                                  completion_window=completion_window)
+    return batch.id
+
+
+def wait_for_batch(client, batch_id, poll_interval=60, sleep=time.sleep, on_poll=None):
+    """Polls the batch until it reaches a terminal status and returns it."""
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        if on_poll:
+            on_poll(batch)
+        if batch.status in TERMINAL_STATUSES:
+            return batch
+        sleep(poll_interval)
+
+
+def read_batch_output(client, batch):
+    """Returns {custom_id: completion text} for every request that succeeded."""
+    results = {}
+    if not batch.output_file_id:
+        return results
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") == 200:
+            results[record["custom_id"]] = response["body"]["choices"][0]["message"]["content"]
+    return results
+
+
+def run_batch(client, requests, requests_path, poll_interval=60, batch_id=None, sleep=time.sleep):
+    """Writes the requests to requests_path, submits them as one batch and waits for the results.
+
+    Passing the batch_id of an earlier submission collects that batch instead of submitting again.
+    Returns the finished batch and {custom_id: completion text}; failed requests are left out.
+    """
+    if batch_id is None:
+        write_jsonl(requests, requests_path)
+        batch_id = submit_batch(client, requests_path)
+        print(f"Submitted batch {batch_id} with {len(requests)} requests")
+
+    def report(batch):
+        counts = batch.request_counts
+        if counts:
+            print(f"Batch {batch.id}: {batch.status} ({counts.completed}/{counts.total} completed, {counts.failed} failed)")
+        else:
+            print(f"Batch {batch.id}: {batch.status}")
+
+    batch = wait_for_batch(client, batch_id, poll_interval, sleep, on_poll=report)
+    return batch, read_batch_output(client, batch)
@@ -0,0 +1,121 @@
+import email.parser
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from batch_runner import batch_request, run_batch
+
+
+class BatchApiHandler(BaseHTTPRequestHandler):
+    """Minimal Files and Batches API: a batch finishes on its second status check.
+
+    Every request is answered with "answer <custom_id>", except custom ids starting with "fail".
+    """
+    files = {}
+    polls = 0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.path == '/v1/files':
+            message = email.parser.BytesParser().parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode() + body)
+            part = next(part for part in message.get_payload() if part.get_param('name', header='content-disposition') == 'file')
+            file_id = f"file-{len(self.files)}"
+            self.files[file_id] = part.get_payload(decode=True)
+            self._send({"id": file_id, "object": "file", "bytes": len(self.files[file_id]), "created_at": 0,
+                        "filename": "batch.jsonl", "purpose": "batch", "status": "processed"})
+        elif self.path == '/v1/batches':
+            request = json.loads(body)
+            lines = []
+            for line in self.files[request['input_file_id']].decode().splitlines():
+                item = json.loads(line)
+                if item['custom_id'].startswith('fail'):
+                    response = {"status_code": 400, "body": {"error": {"message": "bad request"}}}
+                else:
+                    response = {"status_code": 200, "body": {
+                        "choices": [{"index": 0, "message": {"role": "assistant", "content": f"answer {item['custom_id']}"}}]}}
+                lines.append(json.dumps({"id": "req", "custom_id": item['custom_id'], "response": response}))
+            self.files['file-output'] = "\n".join(lines).encode()
+            self._send(self._batch("validating"))
+
+    def do_GET(self):
+        if self.path.startswith('/v1/batches/'):
+            type(self).polls += 1
+            self._send(self._batch("completed" if self.polls >= 2 else "in_progress"))
+        elif self.path.startswith('/v1/files/') and self.path.endswith('/content'):
+            self._send_bytes(self.files[self.path.split('/')[3]])
+
+    def _batch(self, status):
+        batch = {"id": "batch-1", "object": "batch", "endpoint": "/v1/chat/completions", "input_file_id": "file-0",
+                 "completion_window": "24h", "created_at": 0, "status": status}
+        if status == "completed":
+            batch["output_file_id"] = "file-output"
+        return batch
+
+    def _send(self, payload):
+        self._send_bytes(json.dumps(payload).encode(), 'application/json')
+
+    def _send_bytes(self, content, content_type='application/octet-stream'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestRunBatch(unittest.TestCase):
+
+    def setUp(self):
+        BatchApiHandler.files = {}
+        BatchApiHandler.polls = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), BatchApiHandler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = OpenAI(api_key='fake', base_url=f"http://127.0.0.1:{self.server.server_port}/v1", max_retries=0)
+        self.directory = tempfile.mkdtemp()
+        self.sleeps = []
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_submits_polls_and_collects_by_id(self):
+        requests = [batch_request("q1", "prompt 1", 150, "gpt-4o-mini"),
+                    batch_request("fail-q2", "prompt 2", 150, "gpt-4o-mini"),
+                    batch_request("q3", "prompt 3", 150, "gpt-4o-mini")]
+        path = os.path.join(self.directory, 'requests.jsonl')
+
+        batch, results = run_batch(self.client, requests, path, poll_interval=5, sleep=self.sleeps.append)
+
+        self.assertEqual(batch.status, "completed")
+        self.assertEqual(results, {"q1": "answer q1", "q3": "answer q3"})
+        self.assertEqual(self.sleeps, [5])
+        with open(path, encoding='utf-8') as file:
+            submitted = [json.loads(line) for line in file]
+        self.assertEqual(submitted, requests)
+        self.assertEqual(BatchApiHandler.files['file-0'].decode().splitlines()[0], json.dumps(requests[0]))
+
+    def test_collects_existing_batch_without_submitting(self):
+        BatchApiHandler.files['file-output'] = json.dumps({"custom_id": "q1", "response": {"status_code": 200, "body": {
+            "choices": [{"message": {"content": "42"}}]}}}).encode()
+        BatchApiHandler.polls = 1
+
+        _, results = run_batch(self.client, [], os.path.join(self.directory, 'unused.jsonl'), batch_id="batch-1",
+                               sleep=self.sleeps.append)
+
+        self.assertEqual(results, {"q1": "42"})
+        self.assertEqual(self.sleeps, [])
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'unused.jsonl')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+"""Compares the IVF retriever against exact search.
+
+For every nprobe setting it reports recall@k of the IVF results against the exact top-k, the
+share of questions whose correct filename is found (the `rank` metric of the similarity report)
+and the query latency.
+
+Run from the repository root, either on the local index built by create_embeddings.py
+(question embeddings come from the embedding cache or the OpenAI API):
+
+    RETRIEVER_BACKEND=local python create_embeddings.py
+    python benchmarks/ann_benchmark.py --nprobe 1 4 8 16
+
+or on a synthetic clustered corpus that needs no API access:
+
+    python benchmarks/ann_benchmark.py --synthetic 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers import IVFRetriever, LocalRetriever, normalize_rows, rank_matches
+
+
+def synthetic_corpus(size, dimension=256, documents=None, questions=500, seed=0):
+    """Chunks of the same document share a topic vector; questions are noisy copies of a chunk."""
+    rng = np.random.default_rng(seed)
+    documents = documents or max(1, size // 20)
+    topics = rng.normal(size=(documents, dimension))
+    owners = rng.integers(0, documents, size)
+    vectors = normalize_rows(topics[owners] + 0.6 * rng.normal(size=(size, dimension)))
+    filenames = np.array([f"DOC/{owner}.pdf" for owner in owners])
+    retriever = LocalRetriever(vectors, filenames, np.array([str(i) for i in range(size)]))
+
+    sources = rng.integers(0, size, questions)
+    query_vectors = vectors[sources] + 2.0 * rng.normal(size=(questions, dimension)) / np.sqrt(dimension)
+    return retriever, query_vectors, filenames[sources].tolist()
+
+
+def dataset_corpus(index_dir, questions_path):
+    from openai import OpenAI
+
+    from utils import configure_embedding_cache, get_embeddings, load_json
+
+    configure_embedding_cache()
+    questions = load_json(questions_path)
+    vectors = get_embeddings([q['question'] for q in questions], OpenAI(api_key=os.getenv('OPENAI_API_KEY')))
+    return LocalRetriever.open(index_dir, mmap=False), np.array(vectors), [q['filename'] for q in questions]
+
+
+def timed_query(retriever, query_vectors, top_k):
+    start = time.perf_counter()
+    results = retriever.query_batch(query_vectors, top_k)
+    return results, (time.perf_counter() - start) / len(query_vectors)
+
+
+def recall_at_k(exact_results, approximate_results):
+    recalls = []
+    for exact, approximate in zip(exact_results, approximate_results):
+        expected = {m['id'] for m in exact['matches']}
+        recalls.append(len(expected & {m['id'] for m in approximate['matches']}) / len(expected))
+    return np.mean(recalls)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and latency of the IVF retriever against exact search.")
+    parser.add_argument('--index-dir', default='data/local_index')
+    parser.add_argument('--questions', default='data/questions.json')
+    parser.add_argument('--synthetic', type=int, default=0, help="Use a synthetic corpus of this many chunks.")
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--nlist', type=int, default=None)
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    if args.synthetic:
+        exact, query_vectors, correct_filenames = synthetic_corpus(args.synthetic)
+    else:
+        exact, query_vectors, correct_filenames = dataset_corpus(args.index_dir, args.questions)
+
+    exact_results, exact_latency = timed_query(exact, query_vectors, args.top_k)
+    exact_ranks, _ = rank_matches(correct_filenames, exact_results, args.top_k)
+
+    start = time.perf_counter()
+    ivf = IVFRetriever.build(exact, nlist=args.nlist)
+    build_time = time.perf_counter() - start
+
+    print(f"Chunks: {len(exact)}  questions: {len(query_vectors)}  lists: {len(ivf.centroids)}  build: {build_time:.2f}s")
+    print(f"exact      recall@{args.top_k}: 1.000  found: {np.mean(exact_ranks > 0):.3f}  "
+          f"latency: {exact_latency * 1000:.3f} ms/query")
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        results, latency = timed_query(ivf, query_vectors, args.top_k)
+        ranks, _ = rank_matches(correct_filenames, results, args.top_k)
+        print(f"nprobe={nprobe:<4} recall@{args.top_k}: {recall_at_k(exact_results, results):.3f}  "
+              f"found: {np.mean(ranks > 0):.3f}  latency: {latency * 1000:.3f} ms/query")
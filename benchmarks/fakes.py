@@ -0,0 +1,168 @@
+"""Local stand-ins for the OpenAI and Pinecone clients, for benchmarks that must not make paid calls.
+
+Every fake call can be slowed down, fail at random with a 500 or be rejected with a 429 once
+more than `requests_per_minute` calls arrive within a minute. Errors carry `status_code` and a
+`retry-after` header like the real clients' errors, so the shared schedulers retry them as usual.
+
+Embeddings are deterministic: each word is hashed to a fixed random direction and a text is the
+normalized sum of its words, so texts sharing words (company names, years, line items) are close.
+"""
+import hashlib
+import os
+import random
+import re
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from retrievers import LocalRetriever
+
+
+class FakeAPIError(Exception):
+    def __init__(self, status_code, retry_after=None):
+        super().__init__(f"fake API error {status_code}")
+        self.status_code = status_code
+        self.headers = {'retry-after': f"{retry_after:.3f}"} if retry_after is not None else {}
+
+
+class FaultInjector:
+    """Latency, random server errors and a requests-per-minute limit shared by all calls of one fake API."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, requests_per_minute=None, seed=0, clock=time.monotonic,
+                 sleep=time.sleep):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.random = random.Random(seed)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.window_start = clock()
+        self.window_calls = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+
+    def __call__(self):
+        with self.lock:
+            self.calls += 1
+            now = self.clock()
+            if now - self.window_start >= 60:
+                self.window_start = now
+                self.window_calls = 0
+            self.window_calls += 1
+            if self.requests_per_minute and self.window_calls > self.requests_per_minute:
+                self.rate_limited += 1
+                raise FakeAPIError(429, retry_after=60 - (now - self.window_start))
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        if self.latency:
+            self.sleep(self.latency)
+        if failed:
+            raise FakeAPIError(500)
+
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class FakeEmbeddings:
+    def __init__(self, faults, dimension):
+        self.faults = faults
+        self.dimension = dimension
+        self.words = {}
+        self.lock = threading.Lock()
+
+    def _word_vector(self, word):
+        vector = self.words.get(word)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(word.encode('utf-8'), digest_size=8).digest(), 'little')
+            vector = np.random.default_rng(seed).standard_normal(self.dimension).astype(np.float32)
+            with self.lock:
+                self.words[word] = vector
+        return vector
+
+    def embed(self, text, dimensions=None):
+        """Like text-embedding-3, shorter vectors are the leading dimensions of the full one, renormalized."""
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        for word in TOKEN_PATTERN.findall(text.lower()):
+            vector += self._word_vector(word)
+        vector = vector[:dimensions]
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def create(self, input, model, dimensions=None, **kwargs):
+        self.faults()
+        texts = [input] if isinstance(input, str) else input
+        data = [SimpleNamespace(index=i, embedding=self.embed(text, dimensions), object="embedding")
+                for i, text in enumerate(texts)]
+        tokens = sum(len(TOKEN_PATTERN.findall(text)) for text in texts)
+        return SimpleNamespace(data=data, model=model, usage=SimpleNamespace(prompt_tokens=tokens, total_tokens=tokens))
+
+
+class FakeChatCompletions:
+    """Answers with the first number of the question in the prompt, so reports have something to evaluate."""
+
+    def __init__(self, faults):
+        self.faults = faults
+
+    def create(self, messages, model, max_tokens=None, temperature=None, **kwargs):
+        self.faults()
+        prompt = messages[-1]['content']
+        numbers = re.findall(r"\d+(?:\.\d+)?", prompt)
+        content = f"{numbers[0]}%" if numbers else "0"
+        usage = SimpleNamespace(prompt_tokens=len(prompt) // 4 + 1, completion_tokens=2, total_tokens=len(prompt) // 4 + 3)
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+class FakeOpenAI:
+    """Implements client.embeddings.create and client.chat.completions.create."""
+
+    def __init__(self, dimension=256, embedding_faults=None, chat_faults=None):
+        self.embedding_faults = embedding_faults or FaultInjector()
+        self.chat_faults = chat_faults or FaultInjector()
+        self.embeddings = FakeEmbeddings(self.embedding_faults, dimension)
+        self.chat = SimpleNamespace(completions=FakeChatCompletions(self.chat_faults))
+
+
+class FakePineconeIndex:
+    """Implements Index.upsert/query/delete over an in-memory exact index.
+
+    Upserted vectors are buffered and added to the index in one step before the next query or
+    delete, so indexing many small batches does not copy the whole matrix every time.
+    """
+
+    def __init__(self, faults=None):
+        self.faults = faults or FaultInjector()
+        self.local = LocalRetriever(np.zeros((0, 0), dtype=np.float32), np.array([], dtype=str), np.array([], dtype=str))
+        self.pending = []
+        self.lock = threading.Lock()
+
+    def _flush(self):
+        if self.pending:
+            self.local.upsert(self.pending)
+            self.pending = []
+
+    def upsert(self, vectors):
+        self.faults()
+        with self.lock:
+            self.pending.extend(vectors)
+        return {'upserted_count': len(vectors)}
+
+    def query(self, vector, top_k, include_metadata=True):
+        self.faults()
+        with self.lock:
+            self._flush()
+            return self.local.query(vector, top_k)
+
+    def delete(self, ids):
+        self.faults()
+        with self.lock:
+            self._flush()
+            self.local.delete(ids)
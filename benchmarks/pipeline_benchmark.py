@@ -0,0 +1,146 @@
+"""Runs create_embeddings and generate_reports end-to-end against the local fakes in fakes.py.
+
+A synthetic train.json of the requested number of documents is written to a temporary
+directory, converted with data/initialise_data.py, indexed by create_embeddings.main() and
+reported on by generate_reports.main(). For every corpus size it prints the indexing and report
+throughput, peak traced memory, per-stage latency from the tracer and the share of questions
+whose document was retrieved. No API keys or network access are needed:
+
+    python benchmarks/pipeline_benchmark.py --sizes 100 1000 --concurrency 8 --latency 0.02
+
+Pass the same options before and after a change to catch performance regressions.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, os.path.join(REPO_ROOT, 'data'))
+
+from fakes import FakeOpenAI, FakePineconeIndex, FaultInjector
+
+import create_embeddings
+import generate_reports
+import initialise_data
+import tracing
+from rate_limiter import openai_scheduler, vector_store_scheduler
+from retrievers import PineconeRetriever
+
+LINE_ITEMS = ["net sales", "revenue", "operating income", "net income", "gross margin", "total assets",
+              "cash flow", "interest expense", "depreciation", "capital expenditures", "dividends paid",
+              "long-term debt", "inventory", "accounts receivable", "research and development"]
+FILLER = ("the company reported results for the fiscal year compared with prior period amounts "
+          "reflecting changes in market conditions pricing volume and currency").split()
+
+
+def synthetic_training(documents, questions_per_document=1, seed=0):
+    """train.json-shaped filings; every question names the company, line item and years of its filing."""
+    rng = np.random.default_rng(seed)
+    items = []
+    for i in range(documents):
+        company = f"company{i}"
+        year = 2000 + i % 20
+        filename = f"{company.upper()}/{year}/page_{i % 97}.pdf"
+        line_items = [LINE_ITEMS[j] for j in rng.choice(len(LINE_ITEMS), 4, replace=False)]
+        values = rng.integers(100, 10000, size=(len(line_items), 2))
+        text = [f"{company} {item} was {current} in {year} and {previous} in {year - 1} "
+                + " ".join(rng.choice(FILLER, 12)) for item, (current, previous) in zip(line_items, values)]
+        item = {
+            "id": f"{filename}-1",
+            "filename": filename,
+            "pre_text": text[:2],
+            "post_text": text[2:],
+            "table": [["", str(year), str(year - 1)]] + [[name, str(a), str(b)] for name, (a, b) in zip(line_items, values)],
+        }
+        for q in range(questions_per_document):
+            line_item, (current, previous) = line_items[q % len(line_items)], values[q % len(line_items)]
+            item[f"qa_{q}"] = {
+                "question": f"what was the percentage change in {line_item} for {company} from {year - 1} to {year}?",
+                "answer": f"{(current - previous) / previous * 100:.1f}%",
+            }
+        items.append(item)
+    return items
+
+
+def write_dataset(items, directory):
+    os.makedirs(os.path.join(directory, 'data'), exist_ok=True)
+    questions = [question for item in items for question in initialise_data.extract_questions(item)]
+    initialise_data.write_json_to_file(items, os.path.join(directory, 'data', 'train.json'))
+    initialise_data.write_json_to_file(initialise_data.process_training(items), os.path.join(directory, 'data', 'contexts.json'))
+    initialise_data.write_json_to_file(questions, os.path.join(directory, 'data', 'questions.json'))
+    return len(questions)
+
+
+def run(documents, args):
+    directory = tempfile.mkdtemp()
+    previous_directory = os.getcwd()
+    question_count = write_dataset(synthetic_training(documents, args.questions_per_document), directory)
+
+    faults = dict(latency=args.latency, error_rate=args.error_rate, requests_per_minute=args.requests_per_minute)
+    client = FakeOpenAI(dimension=args.dimension, embedding_faults=FaultInjector(**faults),
+                        chat_faults=FaultInjector(**faults))
+    retriever = PineconeRetriever(FakePineconeIndex(FaultInjector(**faults)))
+    create_embeddings.configure(client, retriever)
+    generate_reports.configure(client, retriever)
+    tracer = tracing.configure_tracing()
+    report_args = ['--concurrency', str(args.concurrency), '--completion-cache', '']
+    if args.bulk:
+        report_args.append('--bulk')
+    if args.sequential:
+        report_args.append('--sequential')
+
+    output = io.StringIO()
+    os.chdir(directory)
+    try:
+        tracemalloc.start()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            start = time.perf_counter()
+            create_embeddings.main([])
+            indexed = time.perf_counter()
+            generate_reports.main(report_args)
+            finished = time.perf_counter()
+        peak_bytes = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open(os.path.join('data', 'chunks.jsonl'), encoding='utf-8') as file:
+            chunk_count = sum(1 for _ in file)
+        with open(os.path.join('reports', 'similarity_report.json'), encoding='utf-8') as file:
+            found = np.mean([item['rank'] > 0 for item in json.load(file)])
+    finally:
+        os.chdir(previous_directory)
+        shutil.rmtree(directory)
+
+    print(f"documents={documents} chunks={chunk_count} questions={question_count}")
+    print(f"  index:  {indexed - start:.2f}s ({chunk_count / (indexed - start):.0f} chunks/s)")
+    print(f"  report: {finished - indexed:.2f}s ({question_count / (finished - indexed):.1f} questions/s)")
+    print(f"  peak traced memory: {peak_bytes / 1024 ** 2:.1f} MB, retrieved: {found:.1%}")
+    for line in tracing.format_summary(tracer.summary()).splitlines():
+        print(f"  {line}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against local fake APIs.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000], help="Numbers of synthetic documents.")
+    parser.add_argument('--questions-per-document', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--bulk', action='store_true', help="Run the similarity report with --bulk.")
+    parser.add_argument('--sequential', action='store_true', help="Run generate_reports with --sequential.")
+    parser.add_argument('--dimension', type=int, default=256, help="Dimension of the fake embeddings.")
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every fake API call.")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of fake API calls failing with a 500.")
+    parser.add_argument('--requests-per-minute', type=int, default=None,
+                        help="Per-API request limit above which the fakes answer 429.")
+    args = parser.parse_args()
+
+    for documents in args.sizes:
+        run(documents, args)
+    print(f"OpenAI calls: {openai_scheduler.stats()}  vector store calls: {vector_store_scheduler.stats()}")
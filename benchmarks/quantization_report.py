@@ -0,0 +1,80 @@
+"""Recall versus memory of reduced-dimension and quantized local indexes.
+
+Every combination of --dimensions, --dtypes and --rerank is built from the same full-length
+vectors. Shorter vectors are the leading dimensions renormalized, which is how text-embedding-3
+shortens embeddings when `dimensions` is requested. For each index it reports the memory scanned
+per query (per chunk, in total and projected to --scale times the corpus), the similarity
+report's `rank` metric (share of questions whose filename is in the top-k, share at rank 1, mean
+rank when found), the overlap of the top-k with exact full-length float32 search, and latency.
+
+Run from the repository root on the local index built by create_embeddings.py:
+
+    RETRIEVER_BACKEND=local python create_embeddings.py
+    python benchmarks/quantization_report.py --dimensions 1536 512 256
+
+or on a synthetic corpus that needs no API access:
+
+    python benchmarks/quantization_report.py --synthetic 100000
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ann_benchmark import dataset_corpus, recall_at_k, synthetic_corpus, timed_query
+from retrievers import LocalRetriever, normalize_rows, quantize, rank_matches
+
+
+def truncate(vectors, dimensions):
+    return normalize_rows(np.asarray(vectors, dtype=np.float32)[:, :dimensions])
+
+
+def build(full, dimensions, dtype, rerank):
+    vectors = truncate(full.float_vectors(), dimensions)
+    stored, scales = quantize(vectors, dtype)
+    return LocalRetriever(stored, full.filenames, full.ids, scales=scales,
+                          full_vectors=vectors if rerank else None, rerank=rerank)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recall and memory of reduced-dimension and quantized indexes.")
+    parser.add_argument('--index-dir', default='data/local_index')
+    parser.add_argument('--questions', default='data/questions.json')
+    parser.add_argument('--synthetic', type=int, default=0, help="Use a synthetic corpus of this many chunks.")
+    parser.add_argument('--synthetic-dimension', type=int, default=1536)
+    parser.add_argument('--dimensions', type=int, nargs='+', default=[1536, 512, 256])
+    parser.add_argument('--dtypes', nargs='+', default=['float32', 'float16', 'int8'])
+    parser.add_argument('--rerank', type=int, nargs='+', default=[0, 4],
+                        help="Candidate multipliers re-scored against float32 vectors (0 disables re-ranking).")
+    parser.add_argument('--top-k', type=int, default=10)
+    parser.add_argument('--scale', type=float, default=10.0, help="Corpus growth factor for the projected memory.")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        full, query_vectors, correct_filenames = synthetic_corpus(args.synthetic, dimension=args.synthetic_dimension)
+    else:
+        full, query_vectors, correct_filenames = dataset_corpus(args.index_dir, args.questions)
+    query_vectors = np.asarray(query_vectors, dtype=np.float32)
+    exact_results, _ = timed_query(full, query_vectors, args.top_k)
+
+    print(f"Chunks: {len(full)}  questions: {len(query_vectors)}  full dimension: {full.vectors.shape[1]}")
+    print(f"{'dims':>5} {'dtype':>8} {'rerank':>6} {'B/chunk':>8} {'MB':>8} {f'MB x{args.scale:g}':>9} "
+          f"{'found':>6} {'rank 1':>6} {'mean rank':>9} {f'overlap@{args.top_k}':>10} {'ms/query':>8}")
+    for dimensions in args.dimensions:
+        queries = truncate(query_vectors, dimensions)
+        for dtype in args.dtypes:
+            for rerank in args.rerank:
+                if rerank and dtype == 'float32':
+                    continue
+                retriever = build(full, dimensions, dtype, rerank)
+                results, latency = timed_query(retriever, queries, args.top_k)
+                ranks, _ = rank_matches(correct_filenames, results, args.top_k)
+                found = ranks > 0
+                memory = retriever.memory_bytes()
+                print(f"{min(dimensions, full.vectors.shape[1]):>5} {dtype:>8} {rerank:>6} {memory / len(full):>8.0f} "
+                      f"{memory / 1024 ** 2:>8.1f} {memory * args.scale / 1024 ** 2:>9.1f} {found.mean():>6.3f} "
+                      f"{np.mean(ranks == 1):>6.3f} {ranks[found].mean() if found.any() else 0:>9.2f} "
+                      f"{recall_at_k(exact_results, results):>10.3f} {latency * 1000:>8.3f}")
@@ -0,0 +1,102 @@
+import re
+
+import numpy as np
+
+# Words, years and amounts such as "5.3" or "2,345" are kept as single terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+RRF_K = 60
+
+
+def tokenize(text):
+    return [token.replace(",", "") for token in TOKEN_PATTERN.findall(text.lower())]
+
+
+class BM25Index:
+    """Okapi BM25 over whole documents, with the inverted index stored as flat NumPy arrays.
+
+    The postings of term t are doc_ids[offsets[t]:offsets[t + 1]], next to the precomputed BM25
+    weight of the term in each of those documents, so scoring a query is one bincount.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        """documents is an iterable of (filename, text) pairs, read once."""
+        self.terms = {}
+        filenames = []
+        postings = []
+        lengths = []
+        for doc, (filename, text) in enumerate(documents):
+            filenames.append(filename)
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            lengths.append(sum(counts.values()))
+            for token, count in counts.items():
+                postings.append((self.terms.setdefault(token, len(self.terms)), doc, count))
+
+        self.filenames = np.asarray(filenames, dtype=object)
+        lengths = np.array(lengths, dtype=np.float32)
+        postings = np.array(postings, dtype=np.int64).reshape(-1, 3)
+        postings = postings[np.lexsort((postings[:, 1], postings[:, 0]))]
+        term_ids, self.doc_ids, counts = postings[:, 0], postings[:, 1].astype(np.int32), postings[:, 2]
+        document_frequency = np.bincount(term_ids, minlength=len(self.terms))
+        self.offsets = np.concatenate([[0], np.cumsum(document_frequency)])
+
+        idf = np.log(1 + (len(lengths) - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = lengths.mean() if len(lengths) else 0.0
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / max(average_length, 1e-9))
+        self.weights = (idf[term_ids] * counts * (k1 + 1) / (counts + norm)).astype(np.float32)
+
+    @classmethod
+    def from_contexts(cls, contexts):
+        """Indexes the records one at a time, so only the postings of a RecordStore end up in memory."""
+        return cls((item['filename'], item['context']) for item in contexts)
+
+    def scores(self, text):
+        """BM25 score of every document for the query text."""
+        spans = [(self.offsets[t], self.offsets[t + 1]) for t in
+                 {self.terms[token] for token in tokenize(text) if token in self.terms}]
+        if not spans:
+            return np.zeros(len(self.filenames), dtype=np.float32)
+        docs = np.concatenate([self.doc_ids[start:end] for start, end in spans])
+        weights = np.concatenate([self.weights[start:end] for start, end in spans])
+        return np.bincount(docs, weights=weights, minlength=len(self.filenames))
+
+    def query(self, text, top_k=5):
+        """Same result layout as the vector retrievers, with one match per document."""
+        scores = self.scores(text)
+        top_k = min(top_k, int(np.count_nonzero(scores)))
+        if top_k == 0:
+            return {'matches': []}
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return {'matches': [
+            {'id': self.filenames[i], 'score': float(scores[i]), 'metadata': {'filename': self.filenames[i]}}
+            for i in top
+        ]}
+
+
+def reciprocal_rank_fusion(query_results, top_k=5, k=RRF_K):
+    """Fuses ranked result lists by filename: each file scores the sum of 1 / (k + rank) over the lists.
+
+    Every list is first deduplicated by filename, so a file matched by several chunks counts once
+    at its best rank. The fused matches keep the first list's best match of each file (e.g. its
+    chunk id and cosine similarity as 'score', 0 for files only the other lists found) and order
+    by the fused score, given as 'fusedScore'.
+    """
+    fused = {}
+    representative = {}
+    first_scores = {}
+    for match in query_results[0]['matches'] if query_results else []:
+        first_scores.setdefault(match['metadata']['filename'], match['score'])
+    for query_result in query_results:
+        seen = set()
+        for match in query_result['matches']:
+            filename = match['metadata']['filename']
+            if filename in seen:
+                continue
+            seen.add(filename)
+            fused[filename] = fused.get(filename, 0.0) + 1.0 / (k + len(seen))
+            representative.setdefault(filename, match)
+    ordered = sorted(fused, key=lambda filename: -fused[filename])[:top_k]
+    return {'matches': [dict(representative[filename], score=first_scores.get(filename, 0.0), fusedScore=fused[filename])
+                        for filename in ordered]}
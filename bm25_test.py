@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+from record_store import RecordStore, write_records
+
+contexts = [
+    {"filename": "AAPL/2002/page_23.pdf", "context": "apple net sales decreased in 2001 compared to 2000 . net sales were $ 5,363 million"},
+    {"filename": "UPS/2009/page_33.pdf", "context": "united parcel service cumulative total return compared to the s&p 500 index"},
+    {"filename": "MSFT/2010/page_1.pdf", "context": "microsoft revenue increased in 2010 . operating income was 24.1 billion"},
+]
+
+
+def match(filename, score, chunk_id=None):
+    return {'id': chunk_id or filename, 'score': score, 'metadata': {'filename': filename}}
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.index = BM25Index.from_contexts(contexts)
+
+    def test_tokenize_keeps_numbers(self):
+        self.assertEqual(tokenize("Net sales were $5,363.5 in 2001."), ["net", "sales", "were", "5363.5", "in", "2001"])
+
+    def test_exact_terms_rank_first(self):
+        result = self.index.query("what was the percentage change in net sales from 2000 to 2001?", top_k=3)
+        self.assertEqual(result['matches'][0]['metadata']['filename'], "AAPL/2002/page_23.pdf")
+        result = self.index.query("cumulative return for united parcel service", top_k=3)
+        self.assertEqual(result['matches'][0]['metadata']['filename'], "UPS/2009/page_33.pdf")
+
+    def test_only_matching_documents_are_returned(self):
+        self.assertEqual(len(self.index.query("microsoft operating income", top_k=3)['matches']), 1)
+        self.assertEqual(self.index.query("unknown words", top_k=3), {'matches': []})
+
+    def test_scores_match_reference_formula(self):
+        k1, b = 1.5, 0.75
+        documents = [tokenize(item['context']) for item in contexts]
+        average_length = np.mean([len(document) for document in documents])
+        query = ["net", "sales", "2001"]
+        expected = []
+        for document in documents:
+            score = 0.0
+            for term in query:
+                df = sum(term in other for other in documents)
+                idf = np.log(1 + (len(documents) - df + 0.5) / (df + 0.5))
+                tf = document.count(term)
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(document) / average_length))
+            expected.append(score)
+        np.testing.assert_allclose(self.index.scores("net sales 2001"), expected, rtol=1e-5)
+
+    def test_indexes_a_generator_of_pairs(self):
+        index = BM25Index((item['filename'], item['context']) for item in contexts)
+        self.assertEqual(list(index.filenames), [item['filename'] for item in contexts])
+        np.testing.assert_allclose(index.scores("net sales 2001"), self.index.scores("net sales 2001"))
+
+    def test_streams_a_record_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contexts.records')
+            write_records(contexts, path, 'filename')
+            store = RecordStore(path, 'filename')
+            index = BM25Index.from_contexts(store)
+            store.close()
+        self.assertEqual(list(index.filenames), [item['filename'] for item in contexts])
+        np.testing.assert_allclose(index.scores("net sales 2001"), self.index.scores("net sales 2001"))
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+
+    def test_dedupes_by_filename_and_fuses(self):
+        dense = {'matches': [match("A", 0.9, "A#1"), match("A", 0.85, "A#2"), match("B", 0.8, "B#0")]}
+        lexical = {'matches': [match("C", 12.0), match("B", 10.0)]}
+        fused = reciprocal_rank_fusion([dense, lexical], top_k=5)
+        self.assertEqual([m['metadata']['filename'] for m in fused['matches']], ["B", "A", "C"])
+        self.assertEqual(fused['matches'][0]['id'], "B#0")
+        self.assertAlmostEqual(fused['matches'][0]['fusedScore'], 1 / 62 + 1 / 62)
+        self.assertAlmostEqual(fused['matches'][1]['fusedScore'], 1 / 61)
+        # The dense cosine score is kept, 0 for a file only BM25 found
+        self.assertEqual([m['score'] for m in fused['matches']], [0.8, 0.9, 0.0])
+
+    def test_top_k(self):
+        dense = {'matches': [match("A", 0.9), match("B", 0.8), match("C", 0.7)]}
+        self.assertEqual(len(reciprocal_rank_fusion([dense], top_k=2)['matches']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
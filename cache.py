@@ -0,0 +1,166 @@
+import array
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+
+def hash_key(*parts):
+    return hashlib.sha256("\0".join(parts).encode('utf-8')).hexdigest()
+
+
+class SqliteCache:
+    """Persistent key/value store in SQLite, evicting least recently used entries above max_bytes."""
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, readonly=False):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.readonly = readonly
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+            self.total_bytes = self._stored_bytes()
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Shard processes share the cache files; wait for each other's writes instead of failing
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+        self.conn.commit()
+        self.total_bytes = self._stored_bytes()
+
+    def _stored_bytes(self):
+        return self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get_many(self, keys):
+        """Returns a dict with the cached value of every key that is present."""
+        found = {}
+        keys = list(keys)
+        with self.lock:
+            # SQLite limits the number of bound parameters per statement
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                found.update(rows)
+            if found and not self.readonly:
+                now = time.time()
+                self.conn.executemany("UPDATE entries SET accessed = ? WHERE key = ?", [(now, key) for key in found])
+                self.conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items):
+        if self.readonly:
+            return
+        items = [(key, value, len(value), time.time()) for key, value in items]
+        if not items:
+            return
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", items)
+            self.conn.commit()
+            self.total_bytes += sum(item[2] for item in items)
+            if self.total_bytes > self.max_bytes:
+                self._evict()
+
+    def put(self, key, value):
+        self.put_many([(key, value)])
+
+    def _evict(self):
+        # Other processes may share the file, so re-read the real size before deleting
+        self.total_bytes = self._stored_bytes()
+        cursor = self.conn.execute("SELECT key, size FROM entries ORDER BY accessed")
+        evicted = []
+        while self.total_bytes > self.max_bytes:
+            row = cursor.fetchone()
+            if row is None:
+                break
+            evicted.append((row[0],))
+            self.total_bytes -= row[1]
+        cursor.close()
+        self.conn.executemany("DELETE FROM entries WHERE key = ?", evicted)
+        self.conn.commit()
+        self.evictions += len(evicted)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.total_bytes,
+        }
+
+    def close(self):
+        self.conn.close()
+
+
+class EmbeddingCache(SqliteCache):
+    """Embedding vectors stored as float32, keyed by (model, normalized text)."""
+
+    def get_embeddings(self, texts, model):
+        """Returns a list aligned with texts, holding None for every text that is not cached."""
+        keys = [hash_key(model, text) for text in texts]
+        found = self.get_many(keys)
+        return [decode_vector(found[key]) if key in found else None for key in keys]
+
+    def put_embeddings(self, texts, embeddings, model):
+        self.put_many((hash_key(model, text), encode_vector(embedding)) for text, embedding in zip(texts, embeddings))
+
+
+def encode_vector(vector):
+    return array.array('f', vector).tobytes()
+
+
+def decode_vector(blob):
+    vector = array.array('f')
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class CacheMissError(KeyError):
+    """Raised in replay mode when a completion is not in the cache."""
+
+
+class CompletionCache(SqliteCache):
+    """Chat completions keyed by (model, prompt, max_tokens, temperature).
+
+    In replay mode the cache is opened read-only and a miss raises CacheMissError instead of
+    letting the caller reach the API.
+    """
+
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES, replay=False):
+        super().__init__(path, max_bytes, readonly=replay)
+        self.replay = replay
+
+    def get_completion(self, model, prompt, max_tokens, temperature):
+        value = self.get(completion_key(model, prompt, max_tokens, temperature))
+        if value is None:
+            if self.replay:
+                raise CacheMissError(f"No cached completion for prompt: {prompt[:80]}...")
+            return None
+        return value.decode('utf-8')
+
+    def put_completion(self, model, prompt, max_tokens, temperature, completion):
+        self.put(completion_key(model, prompt, max_tokens, temperature), completion.encode('utf-8'))
+
+
+def completion_key(model, prompt, max_tokens, temperature):
+    return hash_key(model, prompt, str(max_tokens), repr(float(temperature)))
@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import utils
+from cache import CacheMissError, CompletionCache, EmbeddingCache, SqliteCache
+from utils_test import FakeEmbeddingsClient
+
+
+class TestSqliteCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_counts_hits_and_misses(self):
+        cache = SqliteCache(self.path)
+        cache.put('a', b'1')
+        self.assertEqual(cache.get('a'), b'1')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_evicts_least_recently_used(self):
+        cache = SqliteCache(self.path, max_bytes=20)
+        cache.put('a', b'0' * 10)
+        cache.put('b', b'0' * 10)
+        cache.get('a')
+        cache.put('c', b'0' * 10)
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_persists_between_instances(self):
+        cache = EmbeddingCache(self.path)
+        cache.put_embeddings(["some text"], [[0.5, 0.25]], "model")
+        cache.close()
+        reopened = EmbeddingCache(self.path)
+        self.assertEqual(reopened.get_embeddings(["some text", "other"], "model"), [[0.5, 0.25], None])
+        self.assertEqual(reopened.get_embeddings(["some text"], "other-model"), [None])
+
+
+class TestCompletionCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'completions.sqlite')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_includes_parameters(self):
+        cache = CompletionCache(self.path)
+        cache.put_completion("gpt-4o-mini", "prompt", 150, 0.0, "-32%")
+        self.assertEqual(cache.get_completion("gpt-4o-mini", "prompt", 150, 0), "-32%")
+        self.assertIsNone(cache.get_completion("gpt-4o-mini", "prompt", 100, 0.0))
+        self.assertIsNone(cache.get_completion("gpt-4o-mini", "prompt", 150, 0.5))
+        self.assertIsNone(cache.get_completion("gpt-4o", "prompt", 150, 0.0))
+
+    def test_replay_is_read_only(self):
+        CompletionCache(self.path).put_completion("gpt-4o-mini", "prompt", 150, 0.0, "-32%")
+        replay = CompletionCache(self.path, replay=True)
+        self.assertEqual(replay.get_completion("gpt-4o-mini", "prompt", 150, 0.0), "-32%")
+        with self.assertRaises(CacheMissError):
+            replay.get_completion("gpt-4o-mini", "other prompt", 150, 0.0)
+        replay.put_completion("gpt-4o-mini", "other prompt", 150, 0.0, "1")
+        self.assertEqual(CompletionCache(self.path).stats()['bytes'], 4)
+
+
+class TestCachedEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        utils.configure_embedding_cache(os.path.join(self.directory, 'embeddings.sqlite'))
+
+    def tearDown(self):
+        utils.embedding_cache.close()
+        utils.embedding_cache = None
+        shutil.rmtree(self.directory)
+
+    def test_only_uncached_texts_are_requested(self):
+        client = FakeEmbeddingsClient()
+        utils.get_embeddings(["a", "bb"], client)
+        result = utils.get_embeddings(["bb", "ccc", "a"], client)
+        self.assertEqual(result, [[2.0], [3.0], [1.0]])
+        self.assertEqual(client.calls, [["a", "bb"], ["ccc"]])
+
+    def test_rerun_makes_no_calls(self):
+        client = FakeEmbeddingsClient()
+        utils.get_embedding("what was the  revenue\nin 2008?", client)
+        utils.get_embedding("what was the revenue in 2008?", client)
+        self.assertEqual(len(client.calls), 1)
+
+    def test_dimensions_are_cached_separately(self):
+        client = FakeEmbeddingsClient()
+        utils.get_embeddings(["a"], client)
+        utils.get_embeddings(["a"], client, dimensions=256)
+        utils.get_embeddings(["a"], client, dimensions=256)
+        self.assertEqual(client.dimensions, [None, 256])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import json
+import os
+import textwrap
+import threading
+
+
+class Checkpoint:
+    """Append-only JSON Lines log of report results keyed by question id.
+
+    Every record is flushed as soon as it is written, so an interrupted run can resume
+    by skipping the ids already present. Only the byte offset of each record is kept in
+    memory; records are read back from disk when the final report is assembled.
+    """
+
+    def __init__(self, path, resume=False):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.offsets = {}
+        self.lock = threading.Lock()
+        if resume and os.path.exists(path):
+            self._load()
+        else:
+            open(path, 'w').close()
+        self.file = open(path, 'a', encoding='utf-8')
+
+    def _load(self):
+        valid_size = 0
+        with open(self.path, 'rb') as file:
+            for line in iter(file.readline, b''):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A record cut off by a crash; drop it and everything after it
+                    break
+                if not line.endswith(b'\n'):
+                    break
+                self.offsets[record['id']] = valid_size
+                valid_size += len(line)
+        with open(self.path, 'r+b') as file:
+            file.truncate(valid_size)
+
+    def __contains__(self, question_id):
+        return question_id in self.offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def write(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self.lock:
+            self.file.seek(0, os.SEEK_END)
+            self.offsets[record['id']] = self.file.tell()
+            self.file.write(line)
+            self.file.flush()
+
+    def records(self, ids=None):
+        """Yields the stored records for ids (default: all) in the given order."""
+        self.file.flush()
+        ids = self.offsets if ids is None else ids
+        with open(self.path, 'r', encoding='utf-8') as file:
+            for question_id in ids:
+                if question_id in self.offsets:
+                    file.seek(self.offsets[question_id])
+                    yield json.loads(file.readline())
+
+    def close(self):
+        self.file.close()
+
+
+def write_json_array(records, path):
+    """Streams records to path in the same layout as json.dump(records, f, indent=4)."""
+    with open(path, 'w') as file:
+        file.write("[")
+        for i, record in enumerate(records):
+            file.write(",\n" if i else "\n")
+            file.write(textwrap.indent(json.dumps(record, indent=4), "    "))
+        file.write("\n]" if file.tell() > 1 else "]")
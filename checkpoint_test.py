@@ -0,0 +1,64 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from checkpoint import Checkpoint, write_json_array
+
+records = [
+    {"question": "q1", "rank": 1, "id": "a"},
+    {"question": "q2", "rank": 0, "id": "b"},
+    {"question": "q3", "rank": 3, "id": "c"},
+]
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'report.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_resume_skips_completed_ids(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.write(records[0])
+        checkpoint.write(records[1])
+        checkpoint.close()
+
+        resumed = Checkpoint(self.path, resume=True)
+        self.assertIn("a", resumed)
+        self.assertNotIn("c", resumed)
+        resumed.write(records[2])
+        self.assertEqual(list(resumed.records(["c", "a", "b"])), [records[2], records[0], records[1]])
+
+    def test_without_resume_starts_over(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.write(records[0])
+        checkpoint.close()
+        self.assertEqual(len(Checkpoint(self.path)), 0)
+
+    def test_drops_truncated_record(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.write(records[0])
+        checkpoint.close()
+        with open(self.path, 'a') as f:
+            f.write('{"question": "q2", "ra')
+
+        resumed = Checkpoint(self.path, resume=True)
+        self.assertEqual(len(resumed), 1)
+        resumed.write(records[1])
+        self.assertEqual(list(resumed.records()), records[:2])
+
+    def test_write_json_array_matches_json_dump(self):
+        path = os.path.join(self.directory, 'report.json')
+        for data in [records, []]:
+            write_json_array(iter(data), path)
+            with open(path) as f:
+                self.assertEqual(f.read(), json.dumps(data, indent=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import json
+import os
+from collections import defaultdict
+
+
+def write_chunks(path, textChunks):
+    """Saves the indexed chunks as JSON Lines, so matches can be resolved to their text by id."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        for chunk in textChunks:
+            file.write(json.dumps(chunk, ensure_ascii=False))
+            file.write("\n")
+
+
+def display_text(chunk):
+    """Text shown to the LLM: table rows keep their layout instead of the flattened embedding text."""
+    if chunk.get("kind") == "table" and chunk.get("table"):
+        return "\n".join(" | ".join(row) for row in chunk["table"])
+    return chunk["text"]
+
+
+class ChunkStore:
+    """In-memory lookup of the chunks written by create_embeddings, by id and by file position."""
+
+    def __init__(self, chunks):
+        self.chunks = {}
+        self.files = defaultdict(list)
+        for chunk in chunks:
+            self.chunks[chunk["id"]] = chunk
+            self.files[chunk["filename"]].append(chunk)
+        for file_chunks in self.files.values():
+            file_chunks.sort(key=lambda chunk: chunk["position"])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls(json.loads(line) for line in file if line.strip())
+
+    def get(self, chunk_id):
+        return self.chunks.get(chunk_id)
+
+    def neighbours(self, chunk, window=1):
+        """Text chunks of the same file within `window` lines of chunk, in position order."""
+        return [
+            other for other in self.files[chunk["filename"]]
+            if other.get("kind") != "table" and abs(other["position"] - chunk["position"]) <= window
+        ]
+
+    def file_chunks(self, filename):
+        """Every chunk of the file in position order, text and table."""
+        return list(self.files.get(filename, []))
+
+    def table(self, filename):
+        return next((chunk for chunk in self.files[filename] if chunk.get("kind") == "table"), None)
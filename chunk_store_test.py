@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+os.environ.setdefault('OPENAI_API_KEY', 'fake-openai-key')
+
+from chunk_store import ChunkStore, display_text, write_chunks
+from context_builder import build_chunk_context
+from create_embeddings import flatten_text_chunks
+
+filing = {
+    "filename": "AAPL/2002/page_23.pdf",
+    "pre_text": ["line zero", "line one", "line two", "line three"],
+    "post_text": ["line four"],
+    "table": [["", "2001", "2000"], ["net sales", "5363", "7983"]],
+}
+
+
+def count_words(text):
+    return len(text.split())
+
+
+class TestChunkStore(unittest.TestCase):
+
+    def setUp(self):
+        self.chunks = flatten_text_chunks(filing)
+        self.store = ChunkStore(self.chunks)
+
+    def test_round_trip(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'chunks.jsonl')
+            write_chunks(path, self.chunks)
+            loaded = ChunkStore.load(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(loaded.get(self.chunks[2]["id"]), self.chunks[2])
+
+    def test_neighbours_and_table(self):
+        neighbours = self.store.neighbours(self.chunks[2], window=1)
+        self.assertEqual([chunk["text"] for chunk in neighbours], ["line one", "line two", "line three"])
+        self.assertEqual(display_text(self.store.table(filing["filename"])), " | 2001 | 2000\nnet sales | 5363 | 7983")
+
+    def test_chunk_context_holds_matched_lines_and_table(self):
+        matches = [{'id': self.chunks[3]["id"], 'score': 0.8, 'metadata': {'filename': filing["filename"]}}]
+        context = build_chunk_context(matches, self.store, window=0)
+        self.assertEqual(context, "line three\n | 2001 | 2000\nnet sales | 5363 | 7983")
+
+    def test_chunk_context_respects_budget_by_score(self):
+        matches = [
+            {'id': self.chunks[0]["id"], 'score': 0.5, 'metadata': {'filename': filing["filename"]}},
+            {'id': self.chunks[4]["id"], 'score': 0.9, 'metadata': {'filename': filing["filename"]}},
+        ]
+        # "line four" (2 + 1) and the table (10 + 1) fit, "line zero" does not
+        context = build_chunk_context(matches, self.store, max_tokens=15, window=0, count=count_words)
+        self.assertEqual(context, "line four\n | 2001 | 2000\nnet sales | 5363 | 7983")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import functools
+
+from chunk_store import display_text
+
+# Tokenizer used by gpt-4o-mini
+ENCODING_NAME = "o200k_base"
+
+
+@functools.lru_cache(maxsize=None)
+def get_encoding():
+    import tiktoken
+    return tiktoken.get_encoding(ENCODING_NAME)
+
+
+def count_tokens(text):
+    return len(get_encoding().encode(text, disallowed_special=()))
+
+
+def trim_to_budget(text, max_tokens, count=count_tokens):
+    """Keeps the leading lines of text that fit in max_tokens."""
+    kept = []
+    used = 0
+    for line in text.split("\n"):
+        tokens = count(line) + 1
+        if used + tokens > max_tokens:
+            break
+        kept.append(line)
+        used += tokens
+    return "\n".join(kept)
+
+
+def unique_filenames(matches):
+    """Filenames of the matches ordered by their best score, each listed once."""
+    best = {}
+    for match in matches:
+        filename = match['metadata']['filename']
+        best[filename] = max(best.get(filename, float('-inf')), match['score'])
+    return sorted(best, key=lambda filename: -best[filename])
+
+
+def build_context(matches, context_dict, max_tokens=None, count=count_tokens):
+    """Joins the contexts of the matched files, best score first, within max_tokens.
+
+    Files that repeat among the matches are included once. The first file that does not fit
+    in the remaining budget is trimmed to its leading lines and the rest are dropped.
+    """
+    parts = []
+    used = 0
+    for filename in unique_filenames(matches):
+        text = context_dict[filename]['context']
+        if max_tokens is None:
+            parts.append(text)
+            continue
+        tokens = count(text) + 1
+        if used + tokens <= max_tokens:
+            parts.append(text)
+            used += tokens
+            continue
+        trimmed = trim_to_budget(text, max_tokens - used, count)
+        if trimmed:
+            parts.append(trimmed)
+        break
+    return " ".join(parts)
+
+
+def build_chunk_context(matches, chunk_store, max_tokens=None, window=1, count=count_tokens, render=display_text):
+    """Builds the context from the matched chunks instead of whole documents.
+
+    Going through the matches best score first, each matched line is added with `window`
+    neighbouring lines and the table of its file, as long as they fit in max_tokens. A match that
+    is not a chunk id adds the chunks of its whole file.
+    The selected chunks are then rendered per file in their original order, each with render.
+    """
+    selected = {}
+    used = 0
+    for match in sorted(matches, key=lambda match: -match['score']):
+        chunk = chunk_store.get(match['id'])
+        if chunk is not None:
+            candidates = [chunk]
+            if chunk.get("kind") != "table":
+                candidates += chunk_store.neighbours(chunk, window) + [chunk_store.table(chunk["filename"])]
+        else:
+            # Whole-document matches (BM25 hits under --hybrid) carry the filename as id
+            candidates = chunk_store.file_chunks(match['metadata']['filename'])
+        for candidate in candidates:
+            if candidate is None or candidate["id"] in selected:
+                continue
+            if max_tokens is not None:
+                tokens = count(render(candidate)) + 1
+                if used + tokens > max_tokens:
+                    continue
+                used += tokens
+            selected[candidate["id"]] = candidate
+
+    files = {}
+    for chunk in selected.values():
+        files.setdefault(chunk["filename"], []).append(chunk)
+    return "\n\n".join(
+        "\n".join(render(chunk) for chunk in sorted(file_chunks, key=lambda chunk: chunk["position"]))
+        for file_chunks in files.values()
+    )
@@ -0,0 +1,56 @@
+import unittest
+
+from context_builder import build_context, count_tokens, get_encoding, trim_to_budget, unique_filenames
+
+context_dict = {
+    "AAPL/2002/page_23.pdf": {"context": "net sales were 5363\nin 2001 compared to 7983 in 2000"},
+    "UPS/2009/page_33.pdf": {"context": "cumulative return of ups\nwas 73.26 in 2009"},
+    "MSFT/2010/page_1.pdf": {"context": "revenue grew"},
+}
+
+matches = [
+    {'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.8},
+    {'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.9},
+    {'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.7},
+    {'metadata': {'filename': 'MSFT/2010/page_1.pdf'}, 'score': 0.6},
+]
+
+
+def count_words(text):
+    return len(text.split())
+
+
+def encoding_available():
+    try:
+        get_encoding()
+        return True
+    except Exception:
+        return False
+
+
+class TestContextBuilder(unittest.TestCase):
+
+    def test_unique_filenames_by_best_score(self):
+        self.assertEqual(unique_filenames(matches), ["AAPL/2002/page_23.pdf", "UPS/2009/page_33.pdf", "MSFT/2010/page_1.pdf"])
+
+    def test_without_budget_includes_each_file_once(self):
+        context = build_context(matches, context_dict)
+        self.assertEqual(context.count("cumulative return of ups"), 1)
+        self.assertTrue(context.startswith("net sales were 5363"))
+
+    def test_budget_trims_lowest_scoring_file(self):
+        # AAPL takes 10 + 1 tokens; the remaining 7 only fit the first line of UPS (4 + 1)
+        context = build_context(matches, context_dict, max_tokens=18, count=count_words)
+        self.assertEqual(context, context_dict["AAPL/2002/page_23.pdf"]["context"] + " cumulative return of ups")
+
+    def test_trim_to_budget_keeps_whole_lines(self):
+        self.assertEqual(trim_to_budget("one two\nthree four five", 4, count=count_words), "one two")
+        self.assertEqual(trim_to_budget("one two three", 2, count=count_words), "")
+
+    @unittest.skipUnless(encoding_available(), "tiktoken encoding files are not available")
+    def test_count_tokens(self):
+        self.assertLess(count_tokens("net sales"), count_tokens('[{"net sales": "$ 5363"}]'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,25 +1,56 @@
-import pandas as pd
-import uuid
-import itertools
+import argparse
+import hashlib
 import os
 import json
-from openai import OpenAI
 
-from pinecone.grpc import PineconeGRPC as Pinecone
-from pinecone import ServerlessSpec
-from utils import get_embedding
+from chunk_store import write_chunks
+from retrievers import LocalRetriever, PineconeRetriever
+from utils import EMBEDDING_DIMENSIONS, configure_embedding_cache, create_openai_client, get_embeddings
 
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+RETRIEVER_BACKEND = os.getenv('RETRIEVER_BACKEND', 'pinecone')
+LOCAL_INDEX_DIR = os.getenv('LOCAL_INDEX_DIR', 'data/local_index')
+CHUNKS_PATH = os.getenv('CHUNKS_PATH', 'data/chunks.jsonl')
+# Storage of the local index: float32, float16 or int8, optionally with a float32 copy for re-ranking
+VECTOR_DTYPE = os.getenv('VECTOR_DTYPE') or None
+VECTOR_RERANK = int(os.getenv('VECTOR_RERANK', '0'))
 
-pc = Pinecone(api_key=PINECONE_API_KEY)
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Created on first use; configure() injects them, e.g. fakes in tests and benchmarks
+client = None
+retriever = None
 
-def safe_create_index(index_name, pc):
+def configure(openai_client=None, vector_retriever=None):
+    global client, retriever
+    if openai_client is not None:
+        client = openai_client
+    if vector_retriever is not None:
+        retriever = vector_retriever
+
+def get_client():
+    global client
+    if client is None:
+        client = create_openai_client(OPENAI_API_KEY)
+    return client
+
+def get_retriever(index_name):
+    global retriever
+    if retriever is None:
+        if RETRIEVER_BACKEND == 'local':
+            retriever = LocalRetriever.open(LOCAL_INDEX_DIR, dtype=VECTOR_DTYPE, rerank=VECTOR_RERANK)
+        else:
+            from pinecone.grpc import PineconeGRPC as Pinecone
+            pc = Pinecone(api_key=PINECONE_API_KEY)
+            safe_create_index(index_name, pc)
+            retriever = PineconeRetriever(pc.Index(index_name))
+    return retriever
+
+def safe_create_index(index_name, pc, dimension=EMBEDDING_DIMENSIONS or 1536):
+  from pinecone import ServerlessSpec
   if index_name not in pc.list_indexes().names():
       pc.create_index(
           name=index_name,
-          dimension=1536,
+          dimension=dimension,
           metric="cosine",
           spec=ServerlessSpec(
               cloud='aws', 
@@ -27,15 +58,24 @@ def safe_create_index(index_name, pc):
           ) 
       ) 
 
+def chunk_id(filename, position, text):
+    """Deterministic id, so re-indexing the same chunk overwrites its vector instead of adding one."""
+    content_hash = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    return f"{filename}#{position}-{content_hash}"
+
 def flatten_text_chunks(data):
     pre_text = data.get("pre_text", [])
     post_text = data.get("post_text", [])
+    lines = pre_text + post_text
     textChunk =  [
-        {"id": str(uuid.uuid4()), "filename": data["filename"], "text": text}  
-        for _, text in enumerate(pre_text + post_text)
+        {"id": chunk_id(data["filename"], position, text), "filename": data["filename"], "text": text,
+         "position": position, "kind": "text"}
+        for position, text in enumerate(lines)
         if len(text) >= 2
     ]
-    textChunk.append({"id": str(uuid.uuid4()), "filename": data["filename"], "text":" ".join([" ".join(row) for row in data["table"]])})
+    table_text = " ".join([" ".join(row) for row in data["table"]])
+    textChunk.append({"id": chunk_id(data["filename"], len(lines), table_text), "filename": data["filename"], "text": table_text,
+                      "position": len(lines), "kind": "table", "table": data["table"]})
 
     return textChunk
 
@@ -49,40 +89,83 @@ def process_traininig(data_array):
     
     return textChunks
 
-def chunks(iterable, batch_size=200):
-    """A helper function to break an iterable into chunks of size batch_size."""
-    it = iter(iterable)
-    chunk = tuple(itertools.islice(it, batch_size))
-    while chunk:
-        yield chunk
-        chunk = tuple(itertools.islice(it, batch_size))
-
 def load_json_file(filepath):
     with open(filepath, 'r', encoding='utf-8') as file:
         return json.load(file)
 
-def upsert(index, textChunks):
-  df = pd.json_normalize(textChunks)
-  df['embedding'] = df['text'].apply(lambda x: get_embedding(x, client))
+def upsert(retriever, textChunks):
+  embeddings = get_embeddings([chunk['text'] for chunk in textChunks], get_client())
   records = [
       {
-          'id': str(row['id']),
-          'values': row['embedding'],
-          'metadata': {'filename': row['filename']}
+          'id': str(chunk['id']),
+          'values': embedding,
+          'metadata': {'filename': chunk['filename'], 'position': int(chunk['position'])}
       }
-      for _, row in df.iterrows()
+      for chunk, embedding in zip(textChunks, embeddings)
   ]
   print(len(records))
 
-  for ids_vectors_chunk in chunks(records, batch_size=240):
-      index.upsert(vectors=ids_vectors_chunk) 
+  retriever.upsert(records)
+
+def load_manifest(path):
+    """Returns the {chunk id: filename} map of what is currently indexed."""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+def save_manifest(path, textChunks):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump({chunk["id"]: chunk["filename"] for chunk in textChunks}, file)
+
+def diff_chunks(textChunks, manifest):
+    """Splits the current chunks against the manifest into (chunks to embed, ids to delete)."""
+    current_ids = {chunk["id"] for chunk in textChunks}
+    new_chunks = [chunk for chunk in textChunks if chunk["id"] not in manifest]
+    removed_ids = [indexed_id for indexed_id in manifest if indexed_id not in current_ids]
+    return new_chunks, removed_ids
+
+def reindex(retriever, textChunks, manifest_path):
+    """Only embeds and upserts new or changed chunks, and deletes chunks that are gone."""
+    new_chunks, removed_ids = diff_chunks(textChunks, load_manifest(manifest_path))
+    print(f"{len(new_chunks)} new or changed chunks, {len(removed_ids)} removed")
+    if new_chunks:
+        upsert(retriever, new_chunks)
+    if removed_ids:
+        retriever.delete(removed_ids)
+    save_manifest(manifest_path, textChunks)
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description="Embed train.json chunks into the vector index.")
+  parser.add_argument('--incremental', action='store_true',
+                      help="Only index chunks that changed since the last run, according to the manifest.")
+  parser.add_argument('--manifest', default=None,
+                      help="Manifest of indexed chunk ids (defaults to one file per index).")
+  args = parser.parse_args(argv)
 
-if __name__ == "__main__":
   train_array = load_json_file('data/train.json')
   index_name = "finq-index-all"
   textChunks = process_traininig(train_array)
+  embedding_cache = configure_embedding_cache()
   
-  safe_create_index(index_name, pc)
-  index = pc.Index(index_name)
+  retriever = get_retriever(index_name)
+  if RETRIEVER_BACKEND == 'local':
+    manifest_path = args.manifest or os.path.join(LOCAL_INDEX_DIR, 'manifest.json')
+  else:
+    manifest_path = args.manifest or f"data/{index_name}.manifest.json"
   
-  upsert(index, textChunks)
+  if args.incremental:
+    reindex(retriever, textChunks, manifest_path)
+  else:
+    upsert(retriever, textChunks)
+    save_manifest(manifest_path, textChunks)
+  write_chunks(CHUNKS_PATH, textChunks)
+  if embedding_cache:
+    print(f"Embedding cache: {embedding_cache.stats()}")
+
+if __name__ == "__main__":
+  main()
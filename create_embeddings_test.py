@@ -0,0 +1,81 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import create_embeddings
+from create_embeddings import diff_chunks, flatten_text_chunks, process_traininig, reindex
+from retrievers import LocalRetriever
+from utils_test import FakeEmbeddingsClient
+
+filing = {
+    "filename": "AAPL/2002/page_23.pdf",
+    "pre_text": ["net sales decreased", "."],
+    "post_text": ["gross margin increased"],
+    "table": [["", "2001", "2000"], ["net sales", "5363", "7983"]],
+}
+
+
+def fake_embeddings(texts, client):
+    return [[float(len(text)), 1.0] for text in texts]
+
+
+class TestChunkIds(unittest.TestCase):
+
+    def test_ids_are_deterministic(self):
+        first = flatten_text_chunks(filing)
+        second = flatten_text_chunks(dict(filing))
+        self.assertEqual([c["id"] for c in first], [c["id"] for c in second])
+        self.assertEqual(len({c["id"] for c in first}), len(first))
+
+    def test_ids_use_filename_position_and_content(self):
+        chunks = flatten_text_chunks(filing)
+        self.assertEqual([c["id"].split("#")[0] for c in chunks], ["AAPL/2002/page_23.pdf"] * 3)
+        self.assertTrue(chunks[1]["id"].startswith("AAPL/2002/page_23.pdf#2-"))
+        self.assertTrue(chunks[2]["id"].startswith("AAPL/2002/page_23.pdf#3-"))
+
+        changed = flatten_text_chunks(dict(filing, post_text=["gross margin decreased"]))
+        self.assertEqual(changed[0]["id"], chunks[0]["id"])
+        self.assertNotEqual(changed[1]["id"], chunks[1]["id"])
+
+
+class TestReindex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manifest = os.path.join(self.directory, 'manifest.json')
+        self.retriever = LocalRetriever.open(self.directory)
+        create_embeddings.configure(FakeEmbeddingsClient())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_diff_chunks(self):
+        chunks = flatten_text_chunks(filing)
+        manifest = {chunks[0]["id"]: filing["filename"], "gone#0-abc": filing["filename"]}
+        new_chunks, removed_ids = diff_chunks(chunks, manifest)
+        self.assertEqual(new_chunks, chunks[1:])
+        self.assertEqual(removed_ids, ["gone#0-abc"])
+
+    @patch.object(create_embeddings, 'get_embeddings', side_effect=fake_embeddings)
+    def test_only_changes_are_embedded(self, mock_get_embeddings):
+        other = dict(filing, filename="UPS/2009/page_33.pdf")
+        reindex(self.retriever, process_traininig([filing, other]), self.manifest)
+        self.assertEqual(len(self.retriever), 6)
+
+        reindex(self.retriever, process_traininig([filing, other]), self.manifest)
+        self.assertEqual(mock_get_embeddings.call_count, 1)
+
+        edited = dict(other, post_text=["operating income increased"])
+        reindex(self.retriever, process_traininig([filing, edited]), self.manifest)
+        self.assertEqual(mock_get_embeddings.call_args[0][0], ["operating income increased"])
+        self.assertEqual(len(self.retriever), 6)
+
+        reindex(self.retriever, process_traininig([filing]), self.manifest)
+        self.assertEqual(mock_get_embeddings.call_count, 2)
+        self.assertEqual(set(LocalRetriever.open(self.directory).filenames), {"AAPL/2002/page_23.pdf"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
-import numpy as np
-import pandas as pd
+import argparse
+import hashlib
 import json
 
 
@@ -61,6 +61,9 @@ def extract_questions(item):
                 "question": value["question"],
                 "answer": value["answer"]
             }
+            if "program" in value:
+                # Lets the evaluator check the arithmetic against the table (table_store.execute_program)
+                qa_entry["program"] = value["program"]
             qa_entries.append(qa_entry)    
     return qa_entries
 
@@ -72,14 +75,86 @@ def write_json_to_file(data, filepath):
     with open(filepath, 'w', encoding='utf-8') as file:
         json.dump(data, file, ensure_ascii=False, indent=4)
 
+def iter_json_array(filepath, chunk_size=1 << 16):
+    """Yields the elements of a top-level JSON array one at a time, reading the file in chunks."""
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as file:
+        buffer = ''
+        position = 0
+        eof = False
+        started = False
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position < len(buffer):
+                if not started:
+                    if buffer[position] != '[':
+                        raise ValueError(f"{filepath} does not contain a JSON array")
+                    started = True
+                    position += 1
+                    continue
+                if buffer[position] == ']':
+                    return
+                try:
+                    item, end = decoder.raw_decode(buffer, position)
+                    # A value ending exactly at the buffer end may be cut off (e.g. a number)
+                    if end < len(buffer) or eof:
+                        yield item
+                        position = end
+                        continue
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+            elif eof:
+                raise ValueError(f"{filepath} ended before the JSON array was closed")
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+
+def filename_key(filename):
+    """64-bit digest of a filename, so the set of seen files stays small for large inputs."""
+    return int.from_bytes(hashlib.blake2b(filename.encode('utf-8'), digest_size=8).digest(), 'little')
+
+def write_json_line(data, file):
+    file.write(json.dumps(data, ensure_ascii=False))
+    file.write("\n")
+
+def stream_training(input_path, contexts_path, questions_path, limit=None):
+    """Converts train.json into contexts/questions JSON Lines files without loading it into memory."""
+    seen_ids = set()
+    question_count = 0
+    with open(contexts_path, 'w', encoding='utf-8') as contexts_file, \
+            open(questions_path, 'w', encoding='utf-8') as questions_file:
+        for item in iter_json_array(input_path):
+            for question in extract_questions(item):
+                if limit is None or question_count < limit:
+                    write_json_line(question, questions_file)
+                    question_count += 1
+            key = filename_key(item["filename"])
+            if key not in seen_ids:
+                write_json_line(create_context(item), contexts_file)
+                seen_ids.add(key)
+    return question_count, len(seen_ids)
+
 if __name__ == "__main__":
-  data_array = load_json_file('train.json')
-  questions = []
-  for item in data_array:
-      questions.extend(extract_questions(item))
-
-  context = process_training(data_array)
-  write_json_to_file(context, 'contexts.json')
-  #Remove this limit to generate the full set uf 3900 questions
-  limit = 200
-  write_json_to_file(questions[:limit], 'questions.json')
\ No newline at end of file
+  parser = argparse.ArgumentParser(description="Create contexts and questions from train.json.")
+  parser.add_argument('--input', default='train.json')
+  parser.add_argument('--stream', action='store_true',
+                      help="Parse the input incrementally and write contexts.jsonl and questions.jsonl.")
+  #Pass --limit 0 to generate the full set uf 3900 questions
+  parser.add_argument('--limit', type=int, default=200)
+  args = parser.parse_args()
+  limit = args.limit or None
+
+  if args.stream:
+      stream_training(args.input, 'contexts.jsonl', 'questions.jsonl', limit)
+  else:
+      data_array = load_json_file(args.input)
+      questions = []
+      for item in data_array:
+          questions.extend(extract_questions(item))
+
+      context = process_training(data_array)
+      write_json_to_file(context, 'contexts.json')
+      write_json_to_file(questions[:limit], 'questions.json')
\ No newline at end of file
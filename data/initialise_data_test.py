@@ -4,7 +4,8 @@ import os
 
 from data.initialise_data import (convert_table_to_json, stringify_array, count_words,
                               create_context, process_training, extract_questions,
-                              load_json_file, write_json_to_file)
+                              load_json_file, write_json_to_file, iter_json_array,
+                              stream_training)
 
 class TestModuleFunctions(unittest.TestCase):
 
@@ -82,6 +83,14 @@ class TestModuleFunctions(unittest.TestCase):
         result = extract_questions(item)
         self.assertEqual(result, expected)
 
+    def test_extract_questions_keeps_program(self):
+        item = {
+            "id": "Single_AAPL/2002/page_23.pdf-1",
+            "filename": "AAPL/2002/page_23.pdf",
+            "qa": {"question": "What was the change?", "answer": "-32%", "program": "subtract(5363, 7983), divide(#0, 7983)"}
+        }
+        self.assertEqual(extract_questions(item)[0]["program"], "subtract(5363, 7983), divide(#0, 7983)")
+
     def test_load_json_file(self):
         test_data = [{"key": "value"}]
         with open('test.json', 'w', encoding='utf-8') as f:
@@ -103,5 +112,42 @@ class TestModuleFunctions(unittest.TestCase):
         
         os.remove('test_output.json')
 
+    def test_iter_json_array(self):
+        test_data = [{"key": "value [with] brackets", "n": 1}, 2.5, {"nested": {"list": [1, 2]}}, "text"]
+        with open('test_stream.json', 'w', encoding='utf-8') as f:
+            json.dump(test_data, f, indent=4)
+
+        # A tiny chunk size forces values to be split across reads
+        result = list(iter_json_array('test_stream.json', chunk_size=3))
+        self.assertEqual(result, test_data)
+
+        os.remove('test_stream.json')
+
+    def test_stream_training(self):
+        item = {
+            "id": "Single_AAPL/2002/page_23.pdf-1",
+            "filename": "AAPL/2002/page_23.pdf",
+            "pre_text": ["Pre text"],
+            "post_text": ["Post text"],
+            "table": [["", "2001"], ["net sales", "5363"]],
+            "qa": {"question": "What were net sales?", "answer": "5363"}
+        }
+        duplicate = dict(item, id="Single_AAPL/2002/page_23.pdf-2")
+        with open('test_train.json', 'w', encoding='utf-8') as f:
+            json.dump([item, duplicate], f)
+
+        counts = stream_training('test_train.json', 'test_contexts.jsonl', 'test_questions.jsonl', limit=1)
+
+        with open('test_contexts.jsonl', 'r', encoding='utf-8') as f:
+            contexts = [json.loads(line) for line in f]
+        with open('test_questions.jsonl', 'r', encoding='utf-8') as f:
+            questions = [json.loads(line) for line in f]
+        self.assertEqual(counts, (1, 1))
+        self.assertEqual(contexts, process_training([item, duplicate]))
+        self.assertEqual(questions, extract_questions(item))
+
+        for path in ['test_train.json', 'test_contexts.jsonl', 'test_questions.jsonl']:
+            os.remove(path)
+
 if __name__ == "__main__":
     unittest.main()
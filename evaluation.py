@@ -0,0 +1,175 @@
+import argparse
+import re
+
+import numpy as np
+
+from utils import load_records
+
+DEFAULT_TOLERANCES = [3]
+# Lower edges of the similarity score ranges reported per rank
+SCORE_EDGES = [0.5, 0.6, 0.65, 0.7, 0.75]
+SCORE_LABELS = ['< 0.5', '0.5 - 0.6', '0.6 - 0.65', '0.65 - 0.7', '0.7 - 0.75', '> 0.75']
+
+UNIT_SCALES = {
+    'thousand': 1e3, 'thousands': 1e3, 'k': 1e3,
+    'million': 1e6, 'millions': 1e6, 'mm': 1e6, 'm': 1e6,
+    'billion': 1e9, 'billions': 1e9, 'bn': 1e9, 'b': 1e9,
+}
+NUMBER_PATTERN = re.compile(
+    r"(?P<open>\()?\s*(?P<sign>[-+−])?\s*[$€£]?\s*"
+    r"(?P<number>\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d*\.?\d+)"
+    r"\s*(?P<close>\))?\s*(?P<unit>%|percent\b|(?:thousands?|millions?|billions?|mm|bn|k|m|b)\b)?",
+    re.IGNORECASE,
+)
+
+
+def parse_number(text):
+    """Parses the first number in text as (value, unit scale).
+
+    Thousands separators, currency symbols and a leading sign are handled, and a number in
+    parentheses, e.g. "(1,234)", is negative. Percentages keep their value ("-32%" is -32.0).
+    Unit words such as "million" give the scale (1e6), otherwise it is 1. Returns (nan, 1.0)
+    when there is no number.
+    """
+    match = NUMBER_PATTERN.search(str(text)) if text is not None else None
+    if not match:
+        return np.nan, 1.0
+    value = float(match.group('number').replace(',', ''))
+    if match.group('sign') in ('-', '−') or (match.group('open') and match.group('close')):
+        value = -value
+    unit = (match.group('unit') or '').lower()
+    return value, UNIT_SCALES.get(unit, 1.0)
+
+
+def parse_numbers(texts):
+    """Parses every text once into (values, scales) float arrays."""
+    parsed = [parse_number(text) for text in texts]
+    if not parsed:
+        return np.empty(0), np.empty(0)
+    values, scales = zip(*parsed)
+    return np.array(values, dtype=float), np.array(scales, dtype=float)
+
+
+def relative_errors(answers, expected):
+    """Error of each answer relative to the smaller of the two numbers, in percent.
+
+    Numbers are compared both as written and with their units applied, keeping the smaller
+    error, so "$5.3 million" matches both "5.3" and "5,300,000". Unparsable pairs get inf.
+    """
+    answer_values, answer_scales = parse_numbers(answers)
+    expected_values, expected_scales = parse_numbers(expected)
+    as_written = _relative_error(answer_values, expected_values)
+    scaled = _relative_error(answer_values * answer_scales, expected_values * expected_scales)
+    return np.fmin(as_written, scaled)
+
+
+def _relative_error(a, b):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        errors = 100 * np.abs(a - b) / np.minimum(np.abs(a), np.abs(b))
+    errors[a == b] = 0.0
+    return np.where(np.isnan(errors), np.inf, errors)
+
+
+def accuracy_curve(errors, tolerances):
+    """Number of answers within each tolerance (in percent), from one sort of the errors."""
+    return np.searchsorted(np.sort(errors), np.asarray(tolerances, dtype=float), side='right')
+
+
+def score_histogram(ranks, scores, edges=SCORE_EDGES):
+    """Counts of matched questions per (rank, score range), plus the number of unmatched ones.
+
+    Returns (ranks present, counts of shape (len(ranks present), len(edges) + 1), mismatched).
+    """
+    ranks = np.asarray(ranks, dtype=np.int64)
+    scores = np.asarray(scores, dtype=float)
+    matched = ranks != 0
+    bins = np.digitize(scores[matched], edges)
+    present, rank_index = np.unique(ranks[matched], return_inverse=True)
+    counts = np.bincount(rank_index * (len(edges) + 1) + bins,
+                         minlength=len(present) * (len(edges) + 1)).reshape(len(present), len(edges) + 1)
+    return present, counts, int(np.count_nonzero(~matched))
+
+
+def compare_runs(errors_by_id, other_errors_by_id, tolerance):
+    """Counts the questions both runs answered correctly, only one did, or neither, over their common ids."""
+    ids = sorted(errors_by_id.keys() & other_errors_by_id.keys())
+    first = np.array([errors_by_id[i] for i in ids], dtype=float) <= tolerance
+    second = np.array([other_errors_by_id[i] for i in ids], dtype=float) <= tolerance
+    return {
+        "common": len(ids),
+        "both": int(np.count_nonzero(first & second)),
+        "only_first": int(np.count_nonzero(first & ~second)),
+        "only_second": int(np.count_nonzero(~first & second)),
+        "neither": int(np.count_nonzero(~first & ~second)),
+    }
+
+
+def report_errors(report):
+    return relative_errors([item['answer'] for item in report], [item['expectedAnswer'] for item in report])
+
+
+def print_llm_report(report, tolerances=DEFAULT_TOLERANCES, compare_with=None):
+    errors = report_errors(report)
+    print(f"Total questions that pass similarity: {len(report)}")
+    for tolerance, success_count in zip(tolerances, accuracy_curve(errors, tolerances)):
+        print(f"Successfully met {tolerance}% error tolerance: {success_count}")
+        print(f"Failed {tolerance}% error tolerance: {len(report) - success_count}")
+    if compare_with is not None:
+        errors_by_id = dict(zip((item['id'] for item in report), errors))
+        other_by_id = dict(zip((item['id'] for item in compare_with), report_errors(compare_with)))
+        for tolerance in tolerances:
+            counts = compare_runs(errors_by_id, other_by_id, tolerance)
+            print(f"Compared at {tolerance}% on {counts['common']} common questions: both {counts['both']}, "
+                  f"only this run {counts['only_first']}, only the other run {counts['only_second']}, "
+                  f"neither {counts['neither']}")
+
+
+def print_similarity_report(report):
+    total_questions = len(report)
+    ranks, counts, mismatched = score_histogram([item['rank'] for item in report], [item['score'] for item in report])
+    print(f"Total questions: {total_questions}")
+    for rank, rank_counts in zip(ranks, counts):
+        rank_total = rank_counts.sum()
+        print(f"Rank {rank} Total: {rank_total} questions ({(rank_total / total_questions) * 100:.2f}%):")
+        for label, count in reversed(list(zip(SCORE_LABELS, rank_counts))):
+            if count:
+                print(f"  Score {label}: {count} questions ({(count / total_questions) * 100:.2f}%)")
+    print(f"Mismatched: {mismatched} questions ({(mismatched / total_questions) * 100:.2f}%)")
+
+
+def llm_report_main(argv=None, default_report='llm_response_report.json'):
+    parser = argparse.ArgumentParser(description="Accuracy of the LLM response report within error tolerances.")
+    parser.add_argument('report', nargs='?', default=default_report)
+    parser.add_argument('--tolerance', type=float, nargs='+', default=DEFAULT_TOLERANCES,
+                        help="Error tolerances in percent, e.g. --tolerance 0.5 1 3 5.")
+    parser.add_argument('--compare', default=None, help="Another LLM response report to compare with by question id.")
+    parser.add_argument('--programs', default=None,
+                        help="Questions file whose FinQA programs are re-run locally to check the arithmetic of the answers.")
+    parser.add_argument('--tables', default=None,
+                        help="train.json or chunks.jsonl with the tables used by table_* program steps.")
+    args = parser.parse_args(argv)
+    tolerances = [int(t) if float(t).is_integer() else t for t in args.tolerance]
+    report = load_records(args.report)
+    print_llm_report(report, tolerances, load_records(args.compare) if args.compare else None)
+    if args.programs:
+        print_program_check(report, load_records(args.programs), load_records(args.tables) if args.tables else None,
+                            tolerances[0])
+
+
+def print_program_check(report, questions, table_items=None, tolerance=DEFAULT_TOLERANCES[0]):
+    # table_store parses cells with this module
+    from table_store import TableStore, check_programs
+
+    store = TableStore.from_items(table_items) if table_items else None
+    counts = check_programs(report, questions, store, tolerance)
+    print(f"Questions with a program: {counts['programs']}")
+    print(f"Expected answers matching their program at {tolerance}%: {counts['expected']}")
+    print(f"LLM answers matching the program at {tolerance}%: {counts['answers']}")
+    print(f"Programs that could not be run: {counts['failed']}")
+
+
+def similarity_report_main(argv=None, default_report='similarity_report.json'):
+    parser = argparse.ArgumentParser(description="Rank and score distribution of the similarity report.")
+    parser.add_argument('report', nargs='?', default=default_report)
+    args = parser.parse_args(argv)
+    print_similarity_report(load_records(args.report))
@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from evaluation import accuracy_curve, compare_runs, parse_number, relative_errors, score_histogram
+
+
+class TestParseNumber(unittest.TestCase):
+
+    def test_formats(self):
+        self.assertEqual(parse_number("-32%"), (-32.0, 1.0))
+        self.assertEqual(parse_number("$ 5,363"), (5363.0, 1.0))
+        self.assertEqual(parse_number("(1,234.5)"), (-1234.5, 1.0))
+        self.assertEqual(parse_number("$5.3 million"), (5.3, 1e6))
+        self.assertEqual(parse_number("The answer is 12.5 percent."), (12.5, 1.0))
+        self.assertEqual(parse_number("−0.25"), (-0.25, 1.0))
+
+    def test_no_number(self):
+        value, scale = parse_number("n/a")
+        self.assertTrue(np.isnan(value))
+        self.assertEqual(scale, 1.0)
+
+
+class TestAccuracy(unittest.TestCase):
+
+    def test_relative_errors(self):
+        errors = relative_errors(["-32%", "$5.3 million", "5300000", "none", "0", "1.03"],
+                                 ["-32.0%", "5.3", "$5.3 million", "5", "0", "1"])
+        np.testing.assert_allclose(errors, [0.0, 0.0, 0.0, np.inf, 0.0, 3.0])
+
+    def test_matches_single_tolerance_loop(self):
+        answers = ["10", "10.2", "-9.7", "abc", "11", "(10)"]
+        expected = ["10", "10", "-10", "10", "10", "-10"]
+        errors = relative_errors(answers, expected)
+        for tolerance in [0, 1, 3, 10]:
+            loop = sum(1 for error in errors if error <= tolerance)
+            self.assertEqual(accuracy_curve(errors, [tolerance])[0], loop)
+        self.assertEqual(list(accuracy_curve(errors, [0, 2.5, 3.5, 100])), [2, 3, 4, 5])
+
+    def test_compare_runs(self):
+        counts = compare_runs({"a": 0.0, "b": 5.0, "c": 1.0, "x": 0.0}, {"a": 1.0, "b": 0.0, "c": np.inf}, 3)
+        self.assertEqual(counts, {"common": 3, "both": 1, "only_first": 1, "only_second": 1, "neither": 0})
+
+
+class TestScoreHistogram(unittest.TestCase):
+
+    def test_counts_per_rank_and_range(self):
+        ranks, counts, mismatched = score_histogram([1, 1, 2, 0, 1, 3], [0.8, 0.75, 0.55, 0.9, 0.49, 0.62])
+        self.assertEqual(list(ranks), [1, 2, 3])
+        self.assertEqual(counts.tolist(), [[1, 0, 0, 0, 0, 2], [0, 1, 0, 0, 0, 0], [0, 0, 1, 0, 0, 0]])
+        self.assertEqual(mismatched, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,23 +1,91 @@
-import json
-from openai import OpenAI
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
-from pinecone.grpc import PineconeGRPC as Pinecone
+import json
 import os
+import threading
 
-from utils import get_embedding, load_json
+from batch_runner import batch_request, run_batch
+from bm25 import BM25Index, reciprocal_rank_fusion
+from cache import CompletionCache
+from checkpoint import Checkpoint, write_json_array
+from chunk_store import ChunkStore
+from context_builder import build_chunk_context, build_context
+from pipeline import Stage, run_pipeline
+from question_dedup import DEFAULT_THRESHOLD, duplicate_groups, find_duplicates, share_results
+from shards import parse_shard, select_shard, shard_path
+from table_store import TableStore
+from rate_limiter import openai_scheduler, vector_store_scheduler
+from record_store import RecordStore
+from retrievers import create_retriever, rank_matches
+import tracing
+from utils import (configure_embedding_cache, create_openai_client, estimate_tokens, get_embedding, get_embeddings,
+                   load_records)
 
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
-
-pc = Pinecone(api_key=PINECONE_API_KEY)
-client = OpenAI(api_key=OPENAI_API_KEY)
+RETRIEVER_BACKEND = os.getenv('RETRIEVER_BACKEND', 'pinecone')
+LOCAL_INDEX_DIR = os.getenv('LOCAL_INDEX_DIR', 'data/local_index')
+IVF_NLIST = int(os.getenv('IVF_NLIST', '0')) or None
+IVF_NPROBE = int(os.getenv('IVF_NPROBE', '8'))
+VECTOR_RERANK = int(os.getenv('VECTOR_RERANK', '0'))
+COMPLETION_CACHE_PATH = os.getenv('COMPLETION_CACHE_PATH', '.cache/completions.sqlite')
+COMPLETION_CACHE_MAX_MB = int(os.getenv('COMPLETION_CACHE_MAX_MB', '512'))
+CHAT_MODEL = "gpt-4o-mini"
 
 index_name = "finq-index-all"
-index = pc.Index(index_name)
+# Created on first use, so importing this module does not touch the network; configure() injects them
+client = None
+retriever = None
+clients_lock = threading.Lock()
+# Set from the command line; get_response skips the API for prompts it has already answered
+completion_cache = None
+# Set from the command line; when present, prompts hold the matched chunks instead of whole documents
+chunk_store = None
+chunk_window = 1
+# Set from the command line; when present, tables in chunk contexts only keep the rows the question refers to
+table_store = None
+table_rows = None
+# Set from the command line; when present, dense results are fused with BM25 results
+lexical_index = None
+question_lookup = {}
+
+
+def configure(openai_client=None, vector_retriever=None):
+    """Replaces the OpenAI client and/or the retriever, e.g. with fakes in tests."""
+    global client, retriever
+    if openai_client is not None:
+        client = openai_client
+    if vector_retriever is not None:
+        retriever = vector_retriever
+
+def get_client():
+    global client
+    with clients_lock:
+        if client is None:
+            client = create_openai_client(OPENAI_API_KEY)
+        return client
 
+def get_retriever():
+    global retriever
+    with clients_lock:
+        if retriever is None:
+            retriever = create_retriever(RETRIEVER_BACKEND, index_name=index_name, directory=LOCAL_INDEX_DIR,
+                                         api_key=PINECONE_API_KEY, nlist=IVF_NLIST, nprobe=IVF_NPROBE,
+                                         rerank=VECTOR_RERANK)
+        return retriever
 
-def get_response(prompt, max_tokens):
-    response = client.chat.completions.create(
+
+@tracing.traced("get_response")
+def get_response(prompt, max_tokens, temperature=0.0):
+    tracing.add(prompt_bytes=len(prompt.encode('utf-8')))
+    if completion_cache:
+        cached = completion_cache.get_completion(CHAT_MODEL, prompt, max_tokens, temperature)
+        if cached is not None:
+            tracing.add(cache_hits=1)
+            return cached
+    response = openai_scheduler.call(
+        get_client().chat.completions.create,
         messages=[
             {
                 "role": "user",
@@ -25,83 +93,402 @@ def get_response(prompt, max_tokens):
             }
         ],
         max_tokens=max_tokens,
-        model="gpt-4o-mini",
-        temperature=0.0
+        model=CHAT_MODEL,
+        temperature=temperature,
+        tokens=estimate_tokens(prompt) + max_tokens
     )
-    return response.choices[0].message.content
+    content = response.choices[0].message.content
+    usage = getattr(response, 'usage', None)
+    if usage:
+        tracing.add(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+    tracing.add(completion_bytes=len(content.encode('utf-8')) if content else 0)
+    if completion_cache and content is not None:
+        completion_cache.put_completion(CHAT_MODEL, prompt, max_tokens, temperature, content)
+    return content
+
+def fuse_lexical(text, query_result, top_k):
+    if not lexical_index:
+        return query_result
+    return reciprocal_rank_fusion([query_result, lexical_index.query(text, top_k)], top_k)
 
+@tracing.traced("find_similarities")
 def find_similarities(text, top_k=5):
-    return index.query(vector = get_embedding(text, client), top_k = top_k, include_metadata=True)
+    vector = get_embedding(text, get_client())
+    with tracing.span("vector_query"):
+        query_result = get_retriever().query(vector, top_k)
+    return fuse_lexical(text, query_result, top_k)
 
-def get_llm_response(context_dict, question, top_k=5, max_response_tokens=150):
+def build_prompt(context_dict, question, top_k=5, max_context_tokens=None):
+    """Retrieves the context for question and returns the prompt sent to the LLM with that context."""
     query_result = find_similarities(question, top_k)
-    context = " ".join(context_dict[item['metadata']['filename']]['context'] for item in query_result['matches'])
+    return prompt_for_matches(context_dict, question, query_result['matches'], max_context_tokens)
+
+def prompt_for_matches(context_dict, question, matches, max_context_tokens=None):
+    with tracing.span("build_context"):
+        if chunk_store and table_store:
+            render = lambda chunk: table_store.display_text(chunk, question, table_rows)
+            context = build_chunk_context(matches, chunk_store, max_context_tokens, chunk_window, render=render)
+        elif chunk_store:
+            context = build_chunk_context(matches, chunk_store, max_context_tokens, chunk_window)
+        else:
+            context = build_context(matches, context_dict, max_context_tokens)
     prompt = f"Respond with the result only, no explanation of how the calculation was done. It might be a percentage, a decimal number or amount of money. If it's money, make sure you use a currency symbol and  Make sure any calculations are mathematically accurate to the second decimal: '{question}' from the following context: {context}."
+    return prompt, context
+
+@tracing.traced("get_llm_response")
+def get_llm_response(context_dict, question, top_k=5, max_response_tokens=150, max_context_tokens=None):
+    prompt, context = build_prompt(context_dict, question, top_k, max_context_tokens)
     return {
         "response": get_response(prompt, max_response_tokens),
         "context": context
         }
 
-def generate_llm_response_report(questions, context_dict):
+def run_concurrently(func, items, concurrency=1, desc=None, sink=None):
+    """Applies func to every item using up to `concurrency` threads, returning results in input order.
+
+    When sink is given, each result is passed to it as soon as it is ready (in completion order)
+    instead of being collected, and an empty list is returned.
+    """
+    results = []
+    collect = sink or results.append
+    with tqdm(total=len(items), desc=desc) as pbar:
+        if concurrency <= 1:
+            for item in items:
+                collect(func(item))
+                pbar.update(1)
+        else:
+            executor = ThreadPoolExecutor(max_workers=concurrency)
+            try:
+                if sink:
+                    futures = [executor.submit(func, item) for item in items]
+                    completed = (future.result() for future in as_completed(futures))
+                else:
+                    completed = executor.map(func, items)
+                for result in completed:
+                    collect(result)
+                    pbar.update(1)
+            finally:
+                # Don't keep paying for queued questions once one of them has failed
+                executor.shutdown(wait=True, cancel_futures=True)
+    return results
+
+def llm_response_for_question(q, context_dict, max_context_tokens=None):
+    llm_response = get_llm_response(context_dict, q["question"], max_context_tokens=max_context_tokens)
+    return {
+        "question": q["question"],
+        "answer": llm_response["response"],
+        "context": llm_response["context"],
+        "expectedAnswer": q["answer"],
+        "id": q['id']
+    }
+
+def fill_expected_answers(questions):
+    # By id: different questions can have the same text, with different expected answers
     for item in questions:
-        question = item['question']
-        if question in question_lookup:
-            item['answer'] = question_lookup[question]['answer']
-            item['id'] = question_lookup[question]['id']
-
-    llm_responses = []
-    with tqdm(total=len(questions), desc="Processing relevant questions") as pbar:
-      for q in questions:
-        llm_response = get_llm_response(context_dict,q["question"])
-        llm_responses.append({
-              "question": q["question"],
-              "answer":llm_response["response"],
-              "context": llm_response["context"],
-              "expectedAnswer":q["answer"],
-              "id": q['id']
-            })
-        pbar.update(1)
-
-    return llm_responses
-
-def generate_similarity_report(questions):
-    report = []
-    with tqdm(total=len(questions), desc="Processing questions") as pbar:
-      for row in questions:
-          question = row['question']
-          correct_filename = row['filename']
-                
-          query_result = find_similarities(question, 10)
-          
-          current_rank = 0
-          current_score = 0.0
-          
-          matched = next((m for rank, m in enumerate(query_result['matches']) if m['metadata']['filename'] == correct_filename), None)
-          if matched:
-              current_rank = query_result['matches'].index(matched) + 1
-              current_score = matched['score']
-
-          report.append({
-              "question": question,
-              "filename": correct_filename,
-              "rank": current_rank,
-              "score": current_score
-          })
-          pbar.update(1)
+        original = question_lookup.get(item['id'])
+        if original is not None:
+            item['answer'] = original['answer']
+
+def generate_llm_response_report(questions, context_dict, concurrency=1, sink=None, max_context_tokens=None):
+    fill_expected_answers(questions)
+    return run_concurrently(lambda q: llm_response_for_question(q, context_dict, max_context_tokens), questions,
+                            concurrency, desc="Processing relevant questions", sink=sink)
+
+def generate_llm_response_report_batch(questions, context_dict, requests_path, concurrency=1, sink=None,
+                                      max_context_tokens=None, max_response_tokens=150, poll_interval=60, batch_id=None):
+    """Answers the questions through the Batch API instead of one synchronous completion each.
+
+    Prompts are built as in generate_llm_response_report; the ones already in the completion cache
+    are answered directly and the rest are submitted as a single batch, keyed by question id.
+    Questions whose request failed in the batch are not reported, so --resume retries them.
+    """
+    fill_expected_answers(questions)
+
+    def prepare(q):
+        prompt, context = build_prompt(context_dict, q["question"], max_context_tokens=max_context_tokens)
+        return q, prompt, context
+
+    prepared = run_concurrently(prepare, questions, concurrency, desc="Building prompts")
+    results = []
+    collect = sink or results.append
+    requests = []
+    entries = {}
+    for q, prompt, context in prepared:
+        entry = {
+            "question": q["question"],
+            "answer": None,
+            "context": context,
+            "expectedAnswer": q["answer"],
+            "id": q['id']
+        }
+        cached = completion_cache.get_completion(CHAT_MODEL, prompt, max_response_tokens, 0.0) if completion_cache else None
+        if cached is not None:
+            entry["answer"] = cached
+            collect(entry)
+            continue
+        entries[q['id']] = (entry, prompt)
+        requests.append(batch_request(q['id'], prompt, max_response_tokens, CHAT_MODEL))
+    if not requests:
+        return results
+
+    batch, completions = run_batch(get_client(), requests, requests_path, poll_interval, batch_id)
+    for question_id, (entry, prompt) in entries.items():
+        if question_id not in completions:
+            continue
+        entry["answer"] = completions[question_id]
+        if completion_cache:
+            completion_cache.put_completion(CHAT_MODEL, prompt, max_response_tokens, 0.0, entry["answer"])
+        collect(entry)
+    missing = len(entries) - len(completions.keys() & entries.keys())
+    if missing:
+        print(f"Batch {batch.id} ({batch.status}): {missing} questions have no response; rerun with --resume to retry them")
+    return results
 
+def similarity_for_question(row):
+    return similarity_entry(row, find_similarities(row['question'], 10))
+
+def similarity_entry(row, query_result):
+    question = row['question']
+    correct_filename = row['filename']
+
+    current_rank = 0
+    current_score = 0.0
+
+    matched = next((m for rank, m in enumerate(query_result['matches']) if m['metadata']['filename'] == correct_filename), None)
+    if matched:
+        current_rank = query_result['matches'].index(matched) + 1
+        current_score = matched['score']
+
+    entry = {
+        "question": question,
+        "filename": correct_filename,
+        "rank": current_rank,
+        "score": current_score,
+        "id": row['id']
+    }
+    if matched and 'fusedScore' in matched:
+        entry["fusedScore"] = matched['fusedScore']
+    return entry
+
+def generate_reports_pipelined(questions, context_dict, similarity_sink, llm_sink, concurrency=1, skip_similarity=(),
+                               skip_llm=(), max_context_tokens=None, top_k=10, context_top_k=5, max_response_tokens=150):
+    """Produces both reports in one pass: retrieve -> complete -> write.
+
+    The stages run concurrently, connected by bounded queues, so completions start as soon as the
+    first question is retrieved. Each question is embedded and queried once: its top_k matches
+    give the similarity entry, and the first context_top_k of them the LLM context. Questions
+    whose file is not matched (rank 0) stop after the similarity report. Ids in skip_similarity
+    or skip_llm were already reported and are not written again. Retrieval runs in find_similarities
+    and context assembly and completion under a get_llm_response span, as in the sequential reports.
+    """
+    progress = tqdm(total=len(questions), desc="Processing questions")
+
+    def retrieve(q):
+        query_result = find_similarities(q['question'], top_k)
+        entry = similarity_entry(q, query_result)
+        if q['id'] not in skip_similarity:
+            similarity_sink(entry)
+        progress.update(1)
+        if entry['rank'] == 0 or q['id'] in skip_llm:
+            return None
+        return q, query_result['matches'][:context_top_k]
+
+    def complete(item):
+        q, matches = item
+        with tracing.span("get_llm_response"):
+            prompt, context = prompt_for_matches(context_dict, q['question'], matches, max_context_tokens)
+            answer = get_response(prompt, max_response_tokens)
+        return {
+            "question": q["question"],
+            "answer": answer,
+            "context": context,
+            "expectedAnswer": q["answer"],
+            "id": q['id']
+        }
+
+    try:
+        run_pipeline(questions, [
+            Stage("retrieve", retrieve, concurrency),
+            Stage("complete", complete, concurrency),
+            Stage("write", llm_sink),
+        ])
+    finally:
+        progress.close()
+
+def generate_similarity_report(questions, concurrency=1, sink=None):
+    return run_concurrently(similarity_for_question, questions, concurrency, desc="Processing questions", sink=sink)
+
+def generate_similarity_report_bulk(questions, top_k=10, concurrency=1, sink=None):
+    """Embeds all questions in batches and retrieves them with one batched query."""
+    if not questions:
+        return []
+    texts = [row['question'] for row in questions]
+    query_results = get_retriever().query_batch(get_embeddings(texts, get_client()), top_k, concurrency=concurrency)
+    query_results = [fuse_lexical(text, query_result, top_k) for text, query_result in zip(texts, query_results)]
+    ranks, scores = rank_matches([row['filename'] for row in questions], query_results, top_k)
+    report = [
+        {
+            "question": row['question'],
+            "filename": row['filename'],
+            "rank": int(rank),
+            "score": float(score),
+            "id": row['id']
+        }
+        for row, rank, score in zip(questions, ranks, scores)
+    ]
+    for item, query_result in zip(report, query_results):
+        if item['rank'] and 'fusedScore' in query_result['matches'][item['rank'] - 1]:
+            item['fusedScore'] = query_result['matches'][item['rank'] - 1]['fusedScore']
+    if sink:
+        for item in report:
+            sink(item)
+        return []
     return report
 
+def main(argv=None):
+    global completion_cache, chunk_store, chunk_window, table_store, table_rows, lexical_index
+    parser = argparse.ArgumentParser(description="Generate the similarity and LLM response reports.")
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help="Number of questions processed in parallel (bounded by API rate limits).")
+    parser.add_argument('--bulk', action='store_true',
+                        help="Embed all questions in batches and run the similarity report as one batched query.")
+    parser.add_argument('--questions', default='data/questions.json',
+                        help="Questions as a JSON array, JSON Lines (.jsonl) or record store (.records) file.")
+    parser.add_argument('--contexts', default='data/contexts.json',
+                        help="Contexts as a JSON array, JSON Lines (.jsonl) or record store (.records) file.")
+    parser.add_argument('--resume', action='store_true',
+                        help="Keep the results checkpointed by a previous run and only process the remaining questions.")
+    parser.add_argument('--completion-cache', default=COMPLETION_CACHE_PATH,
+                        help="SQLite file caching LLM responses (an empty value disables the cache).")
+    parser.add_argument('--replay', action='store_true',
+                        help="Only answer from the completion cache; a prompt that is not cached is an error.")
+    parser.add_argument('--context-tokens', type=int, default=None,
+                        help="Token budget for the context passed to the LLM (default: no limit).")
+    parser.add_argument('--retrieval', choices=['documents', 'chunks'], default='documents',
+                        help="Pass whole matched documents to the LLM, or only the matched chunks with their neighbours and table.")
+    parser.add_argument('--window', type=int, default=1,
+                        help="Neighbouring lines included around each matched chunk in chunk retrieval.")
+    parser.add_argument('--tables', action='store_true',
+                        help="With chunk retrieval, show only the table rows and columns that share words with the question.")
+    parser.add_argument('--table-rows', type=int, default=None,
+                        help="Maximum table rows kept per file with --tables (default: every matching row).")
+    parser.add_argument('--chunks', default='data/chunks.jsonl',
+                        help="Chunk store written by create_embeddings.py, used by chunk retrieval.")
+    parser.add_argument('--batch', action='store_true',
+                        help="Submit the LLM prompts through the Batch API and wait for the results instead of calling the API per question.")
+    parser.add_argument('--batch-id', default=None,
+                        help="Collect the results of a batch submitted by an earlier --batch run instead of submitting a new one.")
+    parser.add_argument('--poll-interval', type=int, default=60,
+                        help="Seconds between checks of the batch status.")
+    parser.add_argument('--hybrid', action='store_true',
+                        help="Fuse the dense results with a BM25 index over the contexts (reciprocal rank fusion).")
+    parser.add_argument('--trace', action='store_true',
+                        help="Print p50/p95/p99 latency, retries, tokens and bytes per pipeline stage at the end of the run.")
+    parser.add_argument('--trace-file', default=None,
+                        help="Also write every traced call to this JSON Lines file (implies --trace).")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Run the similarity report, then query every relevant question again for the LLM report, "
+                             "instead of streaming each question once through retrieve, complete and write stages "
+                             "(implied by --bulk and --batch).")
+    # The pipelined run is the default; the flag is kept so existing scripts still work
+    parser.add_argument('--pipeline', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--shard', type=parse_shard, default=None,
+                        help="Only process shard i of n (i/n, by question id) and write per-shard reports; "
+                             "combine them with `python shards.py merge --count n`.")
+    parser.add_argument('--dedupe', action='store_true',
+                        help="Retrieve and answer duplicate questions about the same file once and copy the results to the others.")
+    parser.add_argument('--dedupe-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Cosine similarity of the question embeddings above which questions with the same numbers "
+                             "count as duplicates (above 1: only questions equal once normalized).")
+    args = parser.parse_args(argv)
+    if args.pipeline and (args.sequential or args.bulk or args.batch or args.batch_id):
+        parser.error("--pipeline cannot be combined with --sequential, --bulk or --batch")
+    pipelined = not (args.sequential or args.bulk or args.batch or args.batch_id)
+    if args.tables and args.retrieval != 'chunks':
+        parser.error("--tables requires --retrieval chunks")
+    tracer = tracing.configure_tracing(args.trace_file) if args.trace or args.trace_file else None
+    embedding_cache = configure_embedding_cache()
+    if args.completion_cache:
+        completion_cache = CompletionCache(args.completion_cache, COMPLETION_CACHE_MAX_MB * 1024 ** 2, replay=args.replay)
+
+    questions = load_records(args.questions)
+    report_path = (lambda path: shard_path(path, *args.shard)) if args.shard else (lambda path: path)
+    if args.shard:
+        questions = select_shard(questions, *args.shard)
+    question_ids = [item['id'] for item in questions]
+    question_lookup.update((item['id'], item) for item in questions)
+    duplicates = {}
+    if args.dedupe:
+        embed = (lambda texts: get_embeddings(texts, get_client())) if args.dedupe_threshold <= 1 else None
+        duplicates = find_duplicates(questions, embed, args.dedupe_threshold)
+        with open(report_path('reports/question_duplicates.json'), 'w', encoding='utf-8') as file:
+            json.dump(duplicate_groups(duplicates), file, indent=4)
+        print(f"{len(duplicates)} duplicate questions reuse the results of another question")
+    unique_questions = [item for item in questions if item['id'] not in duplicates]
+    if args.retrieval == 'chunks':
+        chunk_store = ChunkStore.load(args.chunks)
+        chunk_window = args.window
+        if args.tables:
+            table_store = TableStore.from_items(chunk for chunk in chunk_store.chunks.values() if chunk.get("kind") == "table")
+            table_rows = args.table_rows
+        context_dict = {}
+    elif args.contexts.endswith('.records'):
+        # Looked up lazily from the memory-mapped store instead of loading every context
+        context_dict = RecordStore(args.contexts, 'filename')
+    else:
+        context_dict = {item['filename']: item for item in load_records(args.contexts)}
+
+    if args.hybrid:
+        if isinstance(context_dict, RecordStore):
+            # Streamed from the store, so the contexts are never all in memory at once
+            lexical_index = BM25Index.from_contexts(context_dict)
+        else:
+            lexical_index = BM25Index.from_contexts(load_records(args.contexts))
+
+    # Results are appended to these JSON Lines files as they arrive, so a crash loses nothing
+    similarity_checkpoint = Checkpoint(report_path('reports/similarity_report.jsonl'), resume=args.resume)
+    llm_checkpoint = Checkpoint(report_path('reports/llm_response_report.jsonl'), resume=args.resume)
+    if pipelined:
+        ranks = {item['id']: item['rank'] for item in similarity_checkpoint.records(question_ids)}
+        pending_questions = [item for item in unique_questions
+                             if item['id'] not in ranks or (ranks[item['id']] != 0 and item['id'] not in llm_checkpoint)]
+        generate_reports_pipelined(pending_questions, context_dict, similarity_checkpoint.write, llm_checkpoint.write,
+                                   args.concurrency, skip_similarity=ranks, skip_llm=llm_checkpoint,
+                                   max_context_tokens=args.context_tokens)
+    else:
+        pending_questions = [item for item in unique_questions if item['id'] not in similarity_checkpoint]
+        if args.bulk:
+            generate_similarity_report_bulk(pending_questions, concurrency=args.concurrency, sink=similarity_checkpoint.write)
+        else:
+            generate_similarity_report(pending_questions, args.concurrency, sink=similarity_checkpoint.write)
+    share_results(similarity_checkpoint, duplicates, question_lookup)
+
+    relevant_questions = [item for item in similarity_checkpoint.records(question_ids) if item['rank'] != 0]
+    relevant_ids = [item['id'] for item in relevant_questions]
+    pending_relevant_questions = [item for item in relevant_questions
+                                  if item['id'] not in llm_checkpoint and item['id'] not in duplicates]
+    if args.batch or args.batch_id:
+        generate_llm_response_report_batch(pending_relevant_questions, context_dict, report_path('reports/llm_batch_requests.jsonl'),
+                                           args.concurrency, sink=llm_checkpoint.write, max_context_tokens=args.context_tokens,
+                                           poll_interval=args.poll_interval, batch_id=args.batch_id)
+    elif not pipelined:
+        generate_llm_response_report(pending_relevant_questions, context_dict, args.concurrency, sink=llm_checkpoint.write,
+                                     max_context_tokens=args.context_tokens)
+
+    share_results(llm_checkpoint, duplicates, question_lookup)
+
+    write_json_array(similarity_checkpoint.records(question_ids), report_path('reports/similarity_report.json'))
+    write_json_array(llm_checkpoint.records(relevant_ids), report_path('reports/llm_response_report.json'))
+    if embedding_cache:
+        print(f"Embedding cache: {embedding_cache.stats()}")
+    if completion_cache:
+        print(f"Completion cache: {completion_cache.stats()}")
+    print(f"OpenAI calls: {openai_scheduler.stats()}")
+    if RETRIEVER_BACKEND == 'pinecone':
+        print(f"Pinecone calls: {vector_store_scheduler.stats()}")
+    if tracer:
+        print(tracing.format_summary(tracer.summary()))
+        tracer.close()
+
 if __name__ == "__main__":
-    questions = load_json('data/questions.json')
-    context_dict = {item['filename']: item for item in load_json('data/contexts.json')}
-    similarity_report = generate_similarity_report(questions)
-    
-    question_lookup = {item['question']: item for item in questions}
-
-    relevant_questions = list(filter(lambda x: x['rank'] != 0, similarity_report))
-    llm_responses = generate_llm_response_report(relevant_questions, context_dict)
-
-    with open('reports/similarity_report.json', 'w') as f:
-        json.dump(similarity_report, f, indent=4)
-    with open('reports/llm_response_report.json', 'w') as f:
-        json.dump(llm_responses, f, indent=4)
\ No newline at end of file
+    main()
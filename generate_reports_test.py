@@ -1,6 +1,19 @@
+import json
 import unittest
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
 import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+
+import numpy as np
+
+import generate_reports
+import utils
+from bm25 import BM25Index
+from cache import CompletionCache
+from retrievers import LocalRetriever, PineconeRetriever
+import tracing
 # Sample data for testing
 questions_json = [
     {
@@ -37,26 +50,12 @@ context_dict = {item['filename']: item for item in contexts_json}
 
 class TestLLMFunctions(unittest.TestCase):
 
-    @patch('utils.load_json')
-    @patch('utils.get_embedding')
-    @patch('openai.OpenAI')
-    @patch('pinecone.grpc.PineconeGRPC')
-    def setUp(self, MockPinecone, MockOpenAI, mock_get_embedding, mock_load_json):
-        os.environ['PINECONE_API_KEY'] = 'fake-pinecone-key'
-        os.environ['OPENAI_API_KEY'] = 'fake-openai-key'
-        
-        # Setup mocks
-        self.mock_pc = MockPinecone.return_value
-        self.mock_client = MockOpenAI.return_value
-        self.mock_index = self.mock_pc.Index.return_value
-
-        mock_get_embedding.return_value = [0.1, 0.2, 0.3]
-        mock_load_json.side_effect = lambda x: questions_json if 'questions' in x else contexts_json
-
-        import generate_reports  # Import your main script/module here
-
+    def setUp(self):
+        self.mock_client = MagicMock()
+        self.mock_index = MagicMock()
         self.main_module = generate_reports
-    
+        self.main_module.configure(self.mock_client, PineconeRetriever(self.mock_index))
+
     def test_find_similarities(self):
         query_result = {
             'matches': [
@@ -89,13 +88,11 @@ class TestLLMFunctions(unittest.TestCase):
         }
         self.mock_index.query.return_value = query_result
 
-        response_mock = {
-            'choices': [
-                {'message': {'content': 'Test response'}},
-            ]
-        }
+        response_mock = SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content='Test response')),
+        ])
         self.mock_client.chat.completions.create.return_value = response_mock
-        self.main_module.question_lookup = {item['question']: item for item in questions_json}
+        self.main_module.question_lookup = {item['id']: item for item in questions_json}
         result = self.main_module.generate_llm_response_report(questions_json, context_dict)
         self.assertEqual(len(result), len(questions_json))
         for item in result:
@@ -124,5 +121,194 @@ class TestLLMFunctions(unittest.TestCase):
             self.assertIn("score", item)
             self.assertIn("similarities_query_result", item)
 
+    def test_generate_similarity_report_concurrent_keeps_order(self):
+        query_result = {
+            'matches': [
+                {'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.8},
+                {'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.7},
+            ]
+        }
+        self.mock_index.query.return_value = query_result
+
+        result = self.main_module.generate_similarity_report(questions_json, concurrency=3)
+
+        self.assertEqual([item['question'] for item in result], [item['question'] for item in questions_json])
+        self.assertEqual([item['rank'] for item in result], [2, 1, 1])
+
+    def test_run_concurrently_keeps_order(self):
+        result = self.main_module.run_concurrently(lambda x: x * 2, list(range(20)), concurrency=4)
+        self.assertEqual(result, [x * 2 for x in range(20)])
+
+    def test_run_concurrently_streams_to_sink(self):
+        written = []
+        result = self.main_module.run_concurrently(lambda x: x * 2, list(range(20)), concurrency=4, sink=written.append)
+        self.assertEqual(result, [])
+        self.assertEqual(sorted(written), [x * 2 for x in range(20)])
+
+    def test_similarity_report_includes_question_id(self):
+        self.mock_index.query.return_value = {'matches': []}
+        result = self.main_module.generate_similarity_report(questions_json)
+        self.assertEqual([item['id'] for item in result], [item['id'] for item in questions_json])
+
+    def test_generate_similarity_report_bulk_matches_serial_report(self):
+        retriever = LocalRetriever(
+            np.eye(3, dtype=np.float32),
+            np.array(['AAPL/2002/page_23.pdf', 'UPS/2009/page_33.pdf', 'MSFT/2010/page_1.pdf']),
+            np.array(['a', 'b', 'c']))
+        self.main_module.configure(vector_retriever=retriever)
+        vectors = {questions_json[0]['question']: [1.0, 0.1, 0.0],
+                   questions_json[1]['question']: [0.9, 0.0, 0.5],
+                   questions_json[2]['question']: [0.0, 1.0, 0.2]}
+        with patch.object(self.main_module, 'get_embeddings', lambda texts, client: [vectors[t] for t in texts]), \
+                patch.object(self.main_module, 'get_embedding', lambda text, client: vectors[text]):
+            bulk = self.main_module.generate_similarity_report_bulk(questions_json)
+            serial = self.main_module.generate_similarity_report(questions_json)
+
+        self.assertEqual([item['rank'] for item in bulk], [1, 3, 1])
+        self.assertEqual([item['rank'] for item in bulk], [item['rank'] for item in serial])
+        for b, s in zip(bulk, serial):
+            self.assertAlmostEqual(b['score'], s['score'], places=6)
+
+    def test_get_response_uses_completion_cache(self):
+        self.mock_client.chat.completions.create.return_value = SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content='$1.5')),
+        ])
+        directory = tempfile.mkdtemp()
+        self.main_module.completion_cache = CompletionCache(os.path.join(directory, 'completions.sqlite'))
+        try:
+            self.assertEqual(self.main_module.get_response("prompt", 150), '$1.5')
+            self.assertEqual(self.main_module.get_response("prompt", 150), '$1.5')
+        finally:
+            self.main_module.completion_cache = None
+            shutil.rmtree(directory)
+        self.assertEqual(self.mock_client.chat.completions.create.call_count, 1)
+
+    def test_hybrid_retrieval_recovers_lexical_match(self):
+        self.mock_index.query.return_value = {
+            'matches': [{'id': 'UPS#1', 'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.8}]
+        }
+        self.main_module.lexical_index = BM25Index.from_contexts(
+            [{"filename": "AAPL/2002/page_23.pdf", "context": "net sales 2001 2000"},
+             {"filename": "UPS/2009/page_33.pdf", "context": "cumulative return"}])
+        try:
+            result = self.main_module.generate_similarity_report(questions_json[:1])
+        finally:
+            self.main_module.lexical_index = None
+        # Missed by the dense results, found through BM25
+        self.assertEqual(result[0]['rank'], 2)
+        self.assertEqual(result[0]['score'], 0.0)
+        self.assertAlmostEqual(result[0]['fusedScore'], 1 / 61)
+
+    def test_chunk_retrieval_includes_files_found_only_by_bm25(self):
+        directory = tempfile.mkdtemp()
+        previous_directory = os.getcwd()
+        chunks = [
+            {"id": "AAPL#0", "filename": "AAPL/2002/page_23.pdf", "text": "net sales fell from 2000 to 2001",
+             "position": 0, "kind": "text"},
+            {"id": "UPS#0", "filename": "UPS/2009/page_33.pdf", "text": "cumulative return of ups stock",
+             "position": 0, "kind": "text"},
+        ]
+        contexts = [{"filename": "AAPL/2002/page_23.pdf", "context": "net sales 2001 2000"},
+                    {"filename": "UPS/2009/page_33.pdf", "context": "cumulative return"}]
+        # The dense index only ever returns the UPS chunk
+        self.mock_index.query.return_value = {
+            'matches': [{'id': 'UPS#0', 'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.8}]
+        }
+        self.mock_client.chat.completions.create.return_value = SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content='-32%')),
+        ])
+        try:
+            os.chdir(directory)
+            os.makedirs('data')
+            with open('data/questions.json', 'w') as file:
+                json.dump(questions_json[:1], file)
+            with open('data/contexts.json', 'w') as file:
+                json.dump(contexts, file)
+            with open('data/chunks.jsonl', 'w') as file:
+                file.writelines(json.dumps(chunk) + "\n" for chunk in chunks)
+            with patch.object(self.main_module, 'get_embedding', lambda text, client: [1.0]):
+                self.main_module.main(['--retrieval', 'chunks', '--hybrid', '--completion-cache', ''])
+            with open('reports/llm_response_report.json') as file:
+                report = json.load(file)
+        finally:
+            os.chdir(previous_directory)
+            shutil.rmtree(directory)
+            self.main_module.chunk_store = None
+            self.main_module.lexical_index = None
+            if utils.embedding_cache:
+                utils.embedding_cache.close()
+                utils.embedding_cache = None
+        self.assertEqual(len(report), 1)
+        self.assertIn("net sales fell from 2000 to 2001", report[0]['context'])
+
+    def test_batch_report_merges_results_by_id(self):
+        self.mock_index.query.return_value = {
+            'matches': [{'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.9}]
+        }
+        self.main_module.question_lookup = {item['id']: item for item in questions_json}
+        submitted = []
+
+        def run_batch(client, requests, requests_path, poll_interval, batch_id):
+            submitted.extend(requests)
+            # The second question failed in the batch
+            return SimpleNamespace(id='batch-1', status='completed'), {requests[0]['custom_id']: '-32%',
+                                                                      requests[2]['custom_id']: '-8.9%'}
+
+        with patch.object(self.main_module, 'run_batch', run_batch):
+            result = self.main_module.generate_llm_response_report_batch(
+                [dict(item) for item in questions_json], context_dict, 'unused.jsonl')
+
+        self.assertEqual([request['custom_id'] for request in submitted], [item['id'] for item in questions_json])
+        self.assertEqual([(item['id'], item['answer']) for item in result],
+                         [(questions_json[0]['id'], '-32%'), (questions_json[2]['id'], '-8.9%')])
+        self.assertIn("Context for AAPL 2002 page 23", submitted[0]['body']['messages'][0]['content'])
+        self.assertEqual(result[0]['expectedAnswer'], '-32%')
+        self.mock_client.chat.completions.create.assert_not_called()
+
+    def test_expected_answers_are_filled_by_id(self):
+        same_text = [dict(questions_json[0], id='first', answer='-32%'), dict(questions_json[0], id='second', answer='5%')]
+        self.main_module.question_lookup = {item['id']: item for item in same_text}
+        entries = [{"question": item['question'], "id": item['id'], "rank": 1} for item in reversed(same_text)]
+        self.main_module.fill_expected_answers(entries)
+        self.assertEqual([(item['id'], item['answer']) for item in entries], [('second', '5%'), ('first', '-32%')])
+
+    def test_pipelined_reports_query_each_question_once(self):
+        matches = {questions_json[0]['question']: 'AAPL/2002/page_23.pdf',
+                   questions_json[1]['question']: 'AAPL/2002/page_23.pdf',
+                   questions_json[2]['question']: 'UPS/2009/page_33.pdf'}
+        self.mock_index.query.side_effect = lambda vector, top_k, include_metadata: {
+            'matches': [{'metadata': {'filename': vector[0]}, 'score': 0.9}]}
+        self.mock_client.chat.completions.create.return_value = SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content='Test response')),
+        ])
+        similarity, llm = [], []
+        with patch.object(self.main_module, 'get_embedding', lambda text, client: [matches[text]]):
+            self.main_module.generate_reports_pipelined(questions_json, context_dict, similarity.append, llm.append,
+                                                        concurrency=2)
+
+        self.assertEqual(self.mock_index.query.call_count, len(questions_json))
+        self.assertEqual(sorted((item['id'], item['rank']) for item in similarity),
+                         sorted([(questions_json[0]['id'], 1), (questions_json[1]['id'], 0), (questions_json[2]['id'], 1)]))
+        # The question whose filing was not retrieved gets no completion
+        self.assertEqual(sorted(item['id'] for item in llm), sorted([questions_json[0]['id'], questions_json[2]['id']]))
+        self.assertEqual(self.mock_client.chat.completions.create.call_count, 2)
+        self.assertTrue(all(item['answer'] == 'Test response' for item in llm))
+
+    def test_pipelined_reports_trace_every_stage(self):
+        self.mock_index.query.return_value = {'matches': [{'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.9}]}
+        self.mock_client.chat.completions.create.return_value = SimpleNamespace(choices=[
+            SimpleNamespace(message=SimpleNamespace(content='Test response')),
+        ])
+        tracer = tracing.configure_tracing()
+        try:
+            with patch.object(utils, 'get_embeddings', lambda texts, client: [[0.1, 0.2]] * len(texts)):
+                self.main_module.generate_reports_pipelined(questions_json[:1], context_dict, [].append, [].append)
+        finally:
+            tracing.tracer = tracing.Tracer(enabled=False)
+        summary = tracer.summary()
+        for stage in ("get_embedding", "vector_query", "find_similarities", "build_context", "get_response",
+                      "get_llm_response"):
+            self.assertEqual(summary[stage]["count"], 1, stage)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,94 @@
+import queue
+import threading
+
+# Passed down a queue once per worker of the next stage when the previous stage has finished
+DONE = object()
+POLL_SECONDS = 0.1
+
+
+class Stage:
+    """A step of the pipeline: func is applied to every item by `workers` threads.
+
+    func returns the item handed to the next stage, or None to drop it there.
+    """
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, workers)
+
+
+def run_pipeline(items, stages, queue_size=64):
+    """Streams items through the stages, each stage reading from a bounded queue filled by the one before.
+
+    All stages run at the same time, so the first item can reach the last stage while later ones
+    are still in the first, and the total time approaches that of the slowest stage. The bounded
+    queues stop a fast stage from running far ahead of a slow one. Items are processed in no
+    particular order. If any stage raises, the other stages stop and the error is re-raised.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+    stop = threading.Event()
+    errors = []
+    remaining = [stage.workers for stage in stages]
+    lock = threading.Lock()
+
+    def put(target, item):
+        while not stop.is_set():
+            try:
+                target.put(item, timeout=POLL_SECONDS)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fail(error):
+        with lock:
+            errors.append(error)
+        stop.set()
+
+    def feed():
+        try:
+            for item in items:
+                if not put(queues[0], item):
+                    return
+        except BaseException as error:
+            fail(error)
+            return
+        for _ in range(stages[0].workers):
+            put(queues[0], DONE)
+
+    def work(index):
+        stage = stages[index]
+        inbox = queues[index]
+        outbox = queues[index + 1] if index + 1 < len(stages) else None
+        try:
+            while not stop.is_set():
+                try:
+                    item = inbox.get(timeout=POLL_SECONDS)
+                except queue.Empty:
+                    continue
+                if item is DONE:
+                    break
+                result = stage.func(item)
+                if outbox is not None and result is not None and not put(outbox, result):
+                    return
+        except BaseException as error:
+            fail(error)
+            return
+        with lock:
+            remaining[index] -= 1
+            last = remaining[index] == 0
+        if last and outbox is not None:
+            for _ in range(stages[index + 1].workers):
+                put(outbox, DONE)
+
+    threads = [threading.Thread(target=feed, name="pipeline-feed", daemon=True)]
+    for index, stage in enumerate(stages):
+        threads += [threading.Thread(target=work, args=(index,), name=f"pipeline-{stage.name}-{worker}", daemon=True)
+                    for worker in range(stage.workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
@@ -0,0 +1,58 @@
+import threading
+import time
+import unittest
+
+from pipeline import Stage, run_pipeline
+
+
+class TestRunPipeline(unittest.TestCase):
+
+    def test_items_pass_through_all_stages(self):
+        written = []
+        run_pipeline(range(50), [
+            Stage("double", lambda x: x * 2, workers=4),
+            Stage("increment", lambda x: x + 1, workers=2),
+            Stage("write", written.append),
+        ], queue_size=4)
+        self.assertEqual(sorted(written), [x * 2 + 1 for x in range(50)])
+
+    def test_none_drops_the_item(self):
+        written = []
+        run_pipeline(range(10), [
+            Stage("odd", lambda x: x if x % 2 else None, workers=3),
+            Stage("write", written.append),
+        ])
+        self.assertEqual(sorted(written), [1, 3, 5, 7, 9])
+
+    def test_stages_overlap(self):
+        first_written = threading.Event()
+        seen_before_first_write = []
+
+        def slow_source():
+            for item in range(5):
+                seen_before_first_write.append(first_written.is_set())
+                time.sleep(0.02)
+                yield item
+
+        run_pipeline(slow_source(), [Stage("write", lambda x: first_written.set())])
+        # The last stage already ran while the feeder was still producing
+        self.assertTrue(seen_before_first_write[-1])
+
+    def test_error_stops_pipeline_and_is_raised(self):
+        processed = []
+
+        def fail_on_three(x):
+            if x == 3:
+                raise ValueError("bad item")
+            return x
+
+        with self.assertRaises(ValueError):
+            run_pipeline(range(10000), [
+                Stage("check", fail_on_three),
+                Stage("write", processed.append),
+            ], queue_size=2)
+        self.assertLess(len(processed), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import re
+
+from retrievers import normalize_rows
+
+DEFAULT_THRESHOLD = 0.97
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+
+
+def normalize_question(text):
+    """Lower case, no thousands separators, punctuation other than . % $ - dropped, single spaces."""
+    text = re.sub(r"(?<=\d),(?=\d{3})", "", text.lower())
+    text = re.sub(r"[^a-z0-9.%$\- ]+", " ", text)
+    return " ".join(token for token in (word.strip(".") for word in text.split()) if token not in ("", "-"))
+
+
+def find_duplicates(questions, embed=None, threshold=DEFAULT_THRESHOLD):
+    """Maps the id of every duplicate question to the id of the first question it duplicates.
+
+    Only questions about the same filename are compared. Questions that are equal once
+    normalized are duplicates; with embed (a function from texts to vectors, e.g. cached
+    get_embeddings) so are questions whose cosine similarity is at least threshold and that
+    mention the same numbers, so "from 2007 to 2008" never shares an answer with "from 2006
+    to 2007" however close their embeddings are.
+    """
+    duplicates = {}
+    by_filename = {}
+    for item in questions:
+        by_filename.setdefault(item['filename'], []).append(item)
+    candidates = []
+    for items in by_filename.values():
+        seen = {}
+        kept = []
+        for item in items:
+            key = normalize_question(item['question'])
+            if key in seen:
+                duplicates[item['id']] = seen[key]
+            else:
+                seen[key] = item['id']
+                kept.append((item, key))
+        if len(kept) > 1:
+            candidates.append(kept)
+    if embed is None or not candidates:
+        return duplicates
+
+    # The raw question, as retrieval embeds it, so a cached embed shares its cache entries
+    texts = [item['question'] for kept in candidates for item, _ in kept]
+    vectors = normalize_rows(embed(texts))
+    start = 0
+    for kept in candidates:
+        group = vectors[start:start + len(kept)]
+        start += len(kept)
+        similarities = group @ group.T
+        numbers = [sorted(NUMBER_PATTERN.findall(key)) for _, key in kept]
+        canonical = []
+        for i, (item, _) in enumerate(kept):
+            match = next((j for j in canonical if similarities[i, j] >= threshold and numbers[i] == numbers[j]), None)
+            if match is None:
+                canonical.append(i)
+            else:
+                duplicates[item['id']] = kept[match][0]['id']
+    return duplicates
+
+
+def share_results(checkpoint, duplicates, questions_by_id):
+    """Writes a copy of the canonical question's result for every duplicate that has none yet.
+
+    The copy keeps the duplicate's own question, id and expected answer, and records the id whose
+    retrieval and answer it reuses as duplicateOf. Returns the number of results written.
+    """
+    pending = {duplicate_id: canonical_id for duplicate_id, canonical_id in duplicates.items()
+               if duplicate_id not in checkpoint and canonical_id in checkpoint}
+    results = {record['id']: record for record in checkpoint.records(sorted(set(pending.values())))}
+    for duplicate_id, canonical_id in pending.items():
+        original = questions_by_id[duplicate_id]
+        entry = dict(results[canonical_id], question=original['question'], id=duplicate_id, duplicateOf=canonical_id)
+        if 'expectedAnswer' in entry:
+            entry['expectedAnswer'] = original['answer']
+        checkpoint.write(entry)
+    return len(pending)
+
+
+def duplicate_groups(duplicates):
+    """{canonical id: [duplicate ids]}, to trace every original question id."""
+    groups = {}
+    for duplicate_id, canonical_id in duplicates.items():
+        groups.setdefault(canonical_id, []).append(duplicate_id)
+    return groups
@@ -0,0 +1,70 @@
+import os
+import re
+import shutil
+import tempfile
+import unittest
+
+from checkpoint import Checkpoint
+from question_dedup import duplicate_groups, find_duplicates, normalize_question, share_results
+
+questions = [
+    {"id": "a", "filename": "UPS/2009/page_33.pdf", "question": "What is the ROI of an investment in UPS in 2004 and sold in 2006?", "answer": "-8.9%"},
+    {"id": "b", "filename": "UPS/2009/page_33.pdf", "question": "what is the roi of an investment in ups in 2004 and sold in 2006 ?", "answer": "-8.9%"},
+    {"id": "c", "filename": "UPS/2009/page_33.pdf", "question": "what was the roi of an investment in ups in 2004 and sold in 2006?", "answer": "-8.91%"},
+    {"id": "d", "filename": "UPS/2009/page_33.pdf", "question": "what was the roi of an investment in ups in 2004 and sold in 2007?", "answer": "-1%"},
+    {"id": "e", "filename": "AAPL/2002/page_23.pdf", "question": "what is the roi of an investment in ups in 2004 and sold in 2006?", "answer": "1%"},
+]
+
+
+def word_vectors(texts):
+    """Bag of words over the vocabulary of the test questions: only the wording decides the similarity."""
+    words = [re.findall(r"\w+", text.lower()) for text in texts]
+    vocabulary = sorted({word for text in words for word in text})
+    return [[text.count(word) for word in vocabulary] for text in words]
+
+
+class TestQuestionDedup(unittest.TestCase):
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("What was the % change in Net Sales, from 2,000 to 2001 ?"),
+                         "what was the % change in net sales from 2000 to 2001")
+
+    def test_exact_duplicates_within_a_file(self):
+        self.assertEqual(find_duplicates(questions), {"b": "a"})
+
+    def test_near_duplicates_need_the_same_numbers(self):
+        duplicates = find_duplicates(questions, word_vectors, threshold=0.9)
+        # d mentions 2007 instead of 2006 and e is about another file
+        self.assertEqual(duplicates, {"b": "a", "c": "a"})
+        self.assertEqual(duplicate_groups(duplicates), {"a": ["b", "c"]})
+        self.assertEqual(find_duplicates(questions, word_vectors, threshold=0.999), {"b": "a"})
+
+    def test_embeds_the_question_text(self):
+        embedded = []
+
+        def embed(texts):
+            embedded.extend(texts)
+            return word_vectors(texts)
+        find_duplicates(questions, embed, threshold=0.9)
+        # The same strings retrieval embeds, so both share the embedding cache
+        self.assertEqual(embedded, [questions[i]["question"] for i in (0, 2, 3)])
+
+    def test_share_results_keeps_own_ids_and_answers(self):
+        directory = tempfile.mkdtemp()
+        try:
+            checkpoint = Checkpoint(os.path.join(directory, 'llm_response_report.jsonl'))
+            checkpoint.write({"question": questions[0]["question"], "answer": "-8.9%", "context": "ctx",
+                              "expectedAnswer": "-8.9%", "id": "a"})
+            by_id = {item["id"]: item for item in questions}
+            self.assertEqual(share_results(checkpoint, {"b": "a", "c": "a", "d": "x"}, by_id), 2)
+            self.assertEqual(share_results(checkpoint, {"b": "a", "c": "a"}, by_id), 0)
+            shared = list(checkpoint.records(["c"]))[0]
+            checkpoint.close()
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(shared, {"question": questions[2]["question"], "answer": "-8.9%", "context": "ctx",
+                                  "expectedAnswer": "-8.91%", "id": "c", "duplicateOf": "a"})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import email.utils
+import os
+import random
+import threading
+import time
+
+import tracing
+
+RETRYABLE_STATUS_CODES = {408, 409, 429}
+RETRYABLE_GRPC_CODES = {'UNAVAILABLE', 'RESOURCE_EXHAUSTED', 'DEADLINE_EXCEEDED', 'ABORTED'}
+RETRYABLE_ERROR_NAMES = {'APIConnectionError', 'APITimeoutError'}
+
+
+def status_code(error):
+    code = getattr(error, 'status_code', None) or getattr(error, 'status', None)
+    return code if isinstance(code, int) else None
+
+
+def is_rate_limited(error):
+    if status_code(error) == 429:
+        return True
+    grpc_code = getattr(error, 'code', None)
+    return callable(grpc_code) and getattr(grpc_code(), 'name', None) == 'RESOURCE_EXHAUSTED'
+
+
+def is_retryable(error):
+    """Rate limits, timeouts, connection failures and 5xx responses are worth retrying."""
+    code = status_code(error)
+    if code is not None:
+        return code in RETRYABLE_STATUS_CODES or code >= 500
+    grpc_code = getattr(error, 'code', None)
+    if callable(grpc_code):
+        return getattr(grpc_code(), 'name', None) in RETRYABLE_GRPC_CODES
+    return isinstance(error, (ConnectionError, TimeoutError)) or type(error).__name__ in RETRYABLE_ERROR_NAMES
+
+
+def retry_after(error, now=None):
+    """Seconds the server asked us to wait, from the retry-after-ms or Retry-After headers."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None) or {}
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        value = headers.get('retry-after')
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            date = email.utils.parsedate_to_datetime(value)
+            return max(0.0, date.timestamp() - (now if now is not None else time.time()))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills `rate_per_minute` units per minute, holding at most one minute's worth."""
+
+    def __init__(self, rate_per_minute, clock=time.monotonic, sleep=time.sleep):
+        self.capacity = float(rate_per_minute)
+        self.rate = self.capacity / 60.0
+        self.available = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        # A single call larger than the bucket could never run otherwise
+        amount = min(amount, self.capacity)
+        while True:
+            with self.lock:
+                self._refill()
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.rate
+            self.sleep(wait)
+
+
+class Scheduler:
+    """Client-side rate limiting and retries for every outbound API call.
+
+    Calls wait for the requests/min and tokens/min buckets, then run with exponential backoff and
+    full jitter on retryable errors, honoring Retry-After. A rate-limit response also pauses all
+    other calls sharing the scheduler and lowers the request rate, which recovers after a run of
+    successful calls (additive increase, multiplicative decrease).
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_retries=6, base_delay=1.0,
+                 max_delay=60.0, clock=time.monotonic, sleep=time.sleep, jitter=random.uniform):
+        self.requests = TokenBucket(requests_per_minute, clock, sleep) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute, clock, sleep) if tokens_per_minute else None
+        self.max_rate = self.requests.rate if self.requests else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.clock = clock
+        self.sleep = sleep
+        self.jitter = jitter
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def backoff(self, attempt):
+        return self.jitter(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _wait_for_pause(self):
+        delay = self.paused_until - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+
+    def _on_success(self):
+        with self.lock:
+            self.calls += 1
+            if self.requests and self.requests.rate < self.max_rate:
+                self.requests.rate = min(self.max_rate, self.requests.rate + self.max_rate * 0.05)
+
+    def _on_rate_limited(self, delay):
+        with self.lock:
+            self.rate_limited += 1
+            self.paused_until = max(self.paused_until, self.clock() + delay)
+            if self.requests:
+                self.requests.rate = max(self.max_rate * 0.1, self.requests.rate * 0.7)
+
+    def call(self, func, *args, tokens=0, **kwargs):
+        """Runs func(*args, **kwargs) within the limits; tokens is the call's estimated token usage."""
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            if self.requests:
+                self.requests.acquire(1)
+            if self.tokens and tokens:
+                self.tokens.acquire(tokens)
+            try:
+                result = func(*args, **kwargs)
+            except Exception as error:
+                if attempt == self.max_retries or not is_retryable(error):
+                    raise
+                delay = retry_after(error)
+                delay = self.backoff(attempt) if delay is None else min(delay, self.max_delay) + self.jitter(0, 0.1)
+                if is_rate_limited(error):
+                    self._on_rate_limited(delay)
+                    tracing.add(rate_limited=1)
+                with self.lock:
+                    self.retries += 1
+                tracing.add(retries=1)
+                self.sleep(delay)
+                continue
+            self._on_success()
+            return result
+
+    def stats(self):
+        return {"calls": self.calls, "retries": self.retries, "rate_limited": self.rate_limited}
+
+
+def env_int(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+# Shared by all calls to the same provider; limits come from the environment and default to none
+openai_scheduler = Scheduler(env_int('OPENAI_REQUESTS_PER_MINUTE'), env_int('OPENAI_TOKENS_PER_MINUTE'))
+vector_store_scheduler = Scheduler(env_int('VECTOR_STORE_REQUESTS_PER_MINUTE'))
@@ -0,0 +1,150 @@
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openai import OpenAI
+
+from rate_limiter import Scheduler, TokenBucket, is_retryable, retry_after
+from utils import get_embeddings
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+def failing(errors, result="ok"):
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+class TestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def scheduler(self, **kwargs):
+        return Scheduler(clock=self.clock, sleep=self.clock.sleep, jitter=lambda low, high: high, **kwargs)
+
+    def test_token_bucket_waits_for_refill(self):
+        bucket = TokenBucket(60, clock=self.clock, sleep=self.clock.sleep)
+        for _ in range(60):
+            bucket.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        bucket.acquire(2)
+        self.assertAlmostEqual(self.clock.now, 2.0)
+
+    def test_retries_with_exponential_backoff(self):
+        scheduler = self.scheduler(base_delay=1.0)
+        result = scheduler.call(failing([StatusError(500), StatusError(503), StatusError(502)]))
+        self.assertEqual(result, "ok")
+        self.assertEqual(self.clock.sleeps, [1.0, 2.0, 4.0])
+        self.assertEqual(scheduler.stats(), {"calls": 1, "retries": 3, "rate_limited": 0})
+
+    def test_honors_retry_after(self):
+        scheduler = self.scheduler()
+        scheduler.call(failing([StatusError(429, {'retry-after': '7'})]))
+        self.assertAlmostEqual(self.clock.sleeps[0], 7.1)
+        self.assertEqual(scheduler.stats()['rate_limited'], 1)
+
+    def test_rate_limit_slows_request_rate(self):
+        scheduler = self.scheduler(requests_per_minute=600)
+        scheduler.call(failing([StatusError(429)]))
+        self.assertLess(scheduler.requests.rate, 10.0)
+        for _ in range(100):
+            scheduler.call(failing([]))
+        self.assertEqual(scheduler.requests.rate, 10.0)
+
+    def test_does_not_retry_client_errors(self):
+        scheduler = self.scheduler()
+        with self.assertRaises(StatusError):
+            scheduler.call(failing([StatusError(400)]))
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_gives_up_after_max_retries(self):
+        scheduler = self.scheduler(max_retries=2)
+        with self.assertRaises(StatusError):
+            scheduler.call(failing([StatusError(429)] * 3))
+        self.assertEqual(len(self.clock.sleeps), 2)
+
+    def test_tokens_per_minute(self):
+        scheduler = self.scheduler(tokens_per_minute=1000)
+        scheduler.call(failing([]), tokens=1000)
+        scheduler.call(failing([]), tokens=500)
+        self.assertAlmostEqual(self.clock.now, 30.0)
+
+    def test_error_classification(self):
+        self.assertTrue(is_retryable(StatusError(429)))
+        self.assertTrue(is_retryable(ConnectionError()))
+        self.assertFalse(is_retryable(StatusError(404)))
+        self.assertFalse(is_retryable(ValueError()))
+        self.assertEqual(retry_after(StatusError(429, {'retry-after-ms': '1500'})), 1.5)
+        self.assertEqual(retry_after(StatusError(429, {'retry-after': 'Thu, 01 Jan 1970 00:00:10 GMT'}), now=4), 6)
+
+
+class RateLimitedEmbeddingsHandler(BaseHTTPRequestHandler):
+    """Answers the first request of every batch with a 429, then returns embeddings."""
+    requests = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        type(self).requests += 1
+        if type(self).requests % 2 == 1:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {'retry-after': '0'})
+            return
+        data = [{"object": "embedding", "index": i, "embedding": [float(len(text))]} for i, text in enumerate(body['input'])]
+        self._send(200, {"object": "list", "data": data, "model": body['model'],
+                         "usage": {"prompt_tokens": 1, "total_tokens": 1}})
+
+    def _send(self, status, payload, headers=None):
+        content = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAgainstLocalServer(unittest.TestCase):
+
+    def test_embeddings_survive_rate_limits(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), RateLimitedEmbeddingsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            client = OpenAI(api_key='fake', base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0)
+            result = get_embeddings(["a", "bb", "ccc"], client, batch_size=2)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(result, [[1.0], [2.0], [3.0]])
+        self.assertEqual(RateLimitedEmbeddingsHandler.requests, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
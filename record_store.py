@@ -0,0 +1,98 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import zlib
+
+import numpy as np
+
+from utils import load_records
+
+INDEX_DTYPE = np.dtype([('key', '<u8'), ('offset', '<u8'), ('length', '<u4')])
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(str(key).encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def index_path(path):
+    return path + '.index.npy'
+
+
+def write_records(records, path, key_field):
+    """Writes records as zlib-compressed JSON blobs, with an index sorted by the hash of record[key_field]."""
+    entries = []
+    with open(path, 'wb') as file:
+        for record in records:
+            blob = zlib.compress(json.dumps(record, ensure_ascii=False).encode('utf-8'))
+            entries.append((key_hash(record[key_field]), file.tell(), len(blob)))
+            file.write(blob)
+    index = np.array(entries, dtype=INDEX_DTYPE)
+    index.sort(order=['key', 'offset'])
+    np.save(index_path(path), index)
+    return len(entries)
+
+
+class RecordStore:
+    """Read-only mapping over a file written by write_records.
+
+    The data file and its index are memory-mapped, so opening the store costs the same whatever
+    its size and a lookup only decompresses the record it returns.
+    """
+
+    def __init__(self, path, key_field='id'):
+        self.path = path
+        self.key_field = key_field
+        self.index = np.load(index_path(path), mmap_mode='r')
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b''
+
+    def _read(self, position):
+        entry = self.index[position]
+        start = int(entry['offset'])
+        return json.loads(zlib.decompress(self.data[start:start + int(entry['length'])]))
+
+    def get(self, key, default=None):
+        hashed = np.uint64(key_hash(key))
+        position = int(np.searchsorted(self.index['key'], hashed))
+        # Different keys may share a hash, so check the key stored in each candidate record
+        while position < len(self.index) and self.index[position]['key'] == hashed:
+            record = self._read(position)
+            if record[self.key_field] == key:
+                return record
+            position += 1
+        return default
+
+    def __getitem__(self, key):
+        record = self.get(key)
+        if record is None:
+            raise KeyError(key)
+        return record
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        """Yields the records in the order they were written."""
+        for position in np.argsort(self.index['offset'], kind='stable'):
+            yield self._read(position)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a JSON or JSON Lines file to an indexed record store.")
+    parser.add_argument('input', help="JSON array or JSON Lines (.jsonl) file, e.g. data/contexts.json")
+    parser.add_argument('output', help="Record store to write, e.g. data/contexts.records")
+    parser.add_argument('--key', default='id',
+                        help="Field records are looked up by: 'filename' for contexts, 'id' for questions and reports.")
+    args = parser.parse_args()
+    count = write_records(load_records(args.input), args.output, args.key)
+    print(f"Wrote {count} records to {args.output} ({os.path.getsize(args.output)} bytes)")
@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+
+import record_store
+from context_builder import build_context
+from record_store import RecordStore, write_records
+from utils import load_records
+
+contexts = [
+    {"filename": "UPS/2009/page_33.pdf", "context": "Context for UPS 2009 page 33", "tokenAmount": 6},
+    {"filename": "AAPL/2002/page_23.pdf", "context": "Context for AAPL 2002 page 23 – $ 5,363", "tokenAmount": 8},
+    {"filename": "MSFT/2010/page_1.pdf", "context": "Context for MSFT", "tokenAmount": 3},
+]
+
+
+class TestRecordStore(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'contexts.records')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup_by_key(self):
+        write_records(contexts, self.path, 'filename')
+        store = RecordStore(self.path, 'filename')
+        self.assertEqual(store['AAPL/2002/page_23.pdf'], contexts[1])
+        self.assertIn('MSFT/2010/page_1.pdf', store)
+        self.assertNotIn('IBM/2001/page_2.pdf', store)
+        with self.assertRaises(KeyError):
+            store['IBM/2001/page_2.pdf']
+        self.assertEqual(len(store), 3)
+        store.close()
+
+    def test_iterates_in_written_order(self):
+        write_records(contexts, self.path, 'filename')
+        self.assertEqual(load_records(self.path), contexts)
+
+    def test_hash_collisions_are_resolved_by_key(self):
+        with patch.object(record_store, 'key_hash', lambda key: 7):
+            write_records(contexts, self.path, 'filename')
+            store = RecordStore(self.path, 'filename')
+            self.assertEqual([store[item['filename']] for item in contexts], contexts)
+            self.assertIsNone(store.get('IBM/2001/page_2.pdf'))
+        self.assertTrue(np.all(store.index['key'] == 7))
+
+    def test_empty_store(self):
+        write_records([], self.path, 'filename')
+        store = RecordStore(self.path, 'filename')
+        self.assertEqual(len(store), 0)
+        self.assertIsNone(store.get('AAPL/2002/page_23.pdf'))
+        self.assertEqual(list(store), [])
+
+    def test_works_as_context_dict(self):
+        write_records(contexts, self.path, 'filename')
+        matches = [{'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.9},
+                   {'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.8}]
+        expected = build_context(matches, {item['filename']: item for item in contexts})
+        self.assertEqual(build_context(matches, RecordStore(self.path, 'filename')), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,345 @@
+import itertools
+import os
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rate_limiter import vector_store_scheduler
+
+UPSERT_BATCH_SIZE = 240
+DELETE_BATCH_SIZE = 1000
+# Queries scored per matrix product; bounds the (queries x chunks) score matrix
+QUERY_BLOCK_SIZE = 256
+# Quantized rows converted to float32 at a time while scoring
+CORPUS_BLOCK_SIZE = 65536
+VECTOR_DTYPES = ('float32', 'float16', 'int8')
+
+
+def chunks(iterable, batch_size=200):
+    """A helper function to break an iterable into chunks of size batch_size."""
+    it = iter(iterable)
+    chunk = tuple(itertools.islice(it, batch_size))
+    while chunk:
+        yield chunk
+        chunk = tuple(itertools.islice(it, batch_size))
+
+
+def normalize_rows(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def quantize(vectors, dtype):
+    """Returns (stored vectors, scales). int8 rows are divided by max(|row|) / 127 and scales holds
+    that factor per row; for float32 and float16 scales is None."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dtype == 'int8':
+        scales = np.abs(vectors).max(axis=-1, initial=0.0) / 127
+        scales[scales == 0] = 1.0
+        return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype: {dtype}")
+    return vectors.astype(dtype), None
+
+
+def dequantize(vectors, scales=None):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors * scales[:, None] if scales is not None else vectors
+
+
+class PineconeRetriever:
+    """Retrieves from a Pinecone index; every query is a network call."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def query(self, vector, top_k=5):
+        return vector_store_scheduler.call(self.index.query, vector=vector, top_k=top_k, include_metadata=True)
+
+    def query_batch(self, vectors, top_k=5, concurrency=1):
+        """Pinecone has no multi-vector query, so queries are issued in parallel threads."""
+        with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as executor:
+            return list(executor.map(lambda vector: self.query(vector, top_k), vectors))
+
+    def upsert(self, records):
+        for ids_vectors_chunk in chunks(records, batch_size=UPSERT_BATCH_SIZE):
+            vector_store_scheduler.call(self.index.upsert, vectors=ids_vectors_chunk)
+
+    def delete(self, ids):
+        for ids_chunk in chunks(ids, batch_size=DELETE_BATCH_SIZE):
+            vector_store_scheduler.call(self.index.delete, ids=list(ids_chunk))
+
+
+class LocalRetriever:
+    """Exact cosine search over L2-normalized vectors kept in a (memory-mapped) NumPy matrix.
+
+    The index is stored in `directory` as vectors.npy (one row per chunk) next to filenames.npy
+    and ids.npy holding the metadata of each row. Vectors are float32 unless the index was
+    created with dtype float16 (half the memory) or int8 (a quarter, with a float32 scale per row
+    in scales.npy). With rerank > 0 a float32 copy is also kept in full_vectors.npy: queries then
+    take the rerank * top_k best candidates from the compact vectors and re-score only those rows
+    against the full ones, which stay on disk when memory-mapped.
+    """
+
+    def __init__(self, vectors, filenames, ids, directory=None, scales=None, full_vectors=None, rerank=0):
+        self.vectors = vectors
+        self.filenames = filenames
+        self.ids = ids
+        self.directory = directory
+        self.scales = scales
+        self.full_vectors = full_vectors
+        self.rerank = rerank
+
+    @classmethod
+    def open(cls, directory, mmap=True, dtype=None, rerank=0):
+        """Loads the index saved in directory, or returns an empty index if there is none yet.
+
+        dtype converts the loaded vectors (they are saved that way on the next change) and sets the
+        dtype of a new index; by default an existing index keeps its dtype and a new one is float32.
+        rerank needs the float32 vectors: a quantized index saved without full_vectors.npy is opened
+        without re-ranking, with a warning.
+        """
+        vectors_path = os.path.join(directory, 'vectors.npy')
+        if not os.path.exists(vectors_path):
+            vectors, scales = quantize(np.zeros((0, 0), dtype=np.float32), dtype or 'float32')
+            full_vectors = np.zeros((0, 0), dtype=np.float32) if rerank else None
+            return cls(vectors, np.array([], dtype=str), np.array([], dtype=str), directory, scales, full_vectors, rerank)
+
+        def load(name):
+            path = os.path.join(directory, name)
+            return np.load(path, mmap_mode='r' if mmap else None) if os.path.exists(path) else None
+
+        retriever = cls(load('vectors.npy'), load('filenames.npy'), load('ids.npy'), directory,
+                        load('scales.npy'), load('full_vectors.npy') if rerank else None, rerank)
+        if rerank and retriever.full_vectors is None and retriever.dtype != 'float32':
+            # A copy made from the dequantized vectors would not give exact scores
+            warnings.warn(f"{directory} holds {retriever.dtype} vectors without full_vectors.npy, so re-ranking "
+                          "is disabled; rebuild the index with VECTOR_RERANK set to keep the float32 vectors")
+            retriever.rerank = 0
+        if dtype and dtype != retriever.dtype or retriever.rerank and retriever.full_vectors is None:
+            full_vectors = retriever.float_vectors()
+            retriever.vectors, retriever.scales = quantize(full_vectors, dtype or retriever.dtype)
+            retriever.full_vectors = full_vectors if retriever.rerank else None
+        return retriever
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def dtype(self):
+        return self.vectors.dtype.name
+
+    def float_vectors(self):
+        """The vectors as float32: the full-precision copy when there is one, dequantized otherwise."""
+        if self.full_vectors is not None:
+            return np.asarray(self.full_vectors)
+        return dequantize(self.vectors, self.scales)
+
+    def memory_bytes(self):
+        """Bytes scanned by every query: the stored vectors and their scales, not the re-ranking copy."""
+        return self.vectors.nbytes + (self.scales.nbytes if self.scales is not None else 0)
+
+    def save(self, directory=None):
+        directory = directory or self.directory
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, 'vectors.npy'), np.asarray(self.vectors))
+        np.save(os.path.join(directory, 'filenames.npy'), np.asarray(self.filenames, dtype=str))
+        np.save(os.path.join(directory, 'ids.npy'), np.asarray(self.ids, dtype=str))
+        for name, array in (('scales.npy', self.scales), ('full_vectors.npy', self.full_vectors)):
+            path = os.path.join(directory, name)
+            if array is not None:
+                np.save(path, np.asarray(array, dtype=np.float32))
+            elif os.path.exists(path):
+                os.remove(path)
+
+    def _store(self, vectors):
+        """Replaces all vectors with the given float32 rows, quantized to the index dtype."""
+        self.vectors, self.scales = quantize(vectors, self.dtype)
+        if self.full_vectors is not None:
+            self.full_vectors = vectors
+
+    def upsert(self, records):
+        """Adds or replaces records shaped like Pinecone vectors ({'id', 'values', 'metadata'}) and saves the index."""
+        records = list({record['id']: record for record in records}.values())
+        if not records:
+            return
+        new_ids = np.array([record['id'] for record in records], dtype=str)
+        keep = ~np.isin(self.ids, new_ids)
+        new_vectors = normalize_rows([record['values'] for record in records])
+        self._store(new_vectors if not keep.any() else np.vstack([self.float_vectors()[keep], new_vectors]))
+        self.filenames = np.concatenate([self.filenames[keep], [record['metadata']['filename'] for record in records]]).astype(str)
+        self.ids = np.concatenate([self.ids[keep], new_ids]).astype(str)
+        if self.directory:
+            self.save()
+
+    def delete(self, ids):
+        keep = ~np.isin(self.ids, np.asarray(list(ids), dtype=str))
+        self.vectors = np.asarray(self.vectors)[keep]
+        if self.scales is not None:
+            self.scales = np.asarray(self.scales)[keep]
+        if self.full_vectors is not None:
+            self.full_vectors = np.asarray(self.full_vectors)[keep]
+        self.filenames = self.filenames[keep]
+        self.ids = self.ids[keep]
+        if self.directory:
+            self.save()
+
+    def _match(self, i, score):
+        return {'id': str(self.ids[i]), 'score': float(score), 'metadata': {'filename': str(self.filenames[i])}}
+
+    def _scores(self, queries):
+        """(queries x chunks) cosine scores; quantized rows are converted to float32 one block at a time."""
+        if self.vectors.dtype == np.float32:
+            return queries @ self.vectors.T
+        scores = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), CORPUS_BLOCK_SIZE):
+            block = np.asarray(self.vectors[start:start + CORPUS_BLOCK_SIZE], dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def search(self, vectors, top_k=5):
+        """Returns (indices, scores) arrays of shape (queries, top_k), best match first."""
+        queries = normalize_rows(np.atleast_2d(vectors))
+        top_k = min(top_k, len(self))
+        indices = np.zeros((len(queries), top_k), dtype=np.int64)
+        scores = np.zeros((len(queries), top_k), dtype=np.float32)
+        if top_k == 0:
+            return indices, scores
+        rerank = self.rerank and self.full_vectors is not None
+        candidates = min(top_k * self.rerank, len(self)) if rerank else top_k
+        for start in range(0, len(queries), QUERY_BLOCK_SIZE):
+            block_queries = queries[start:start + QUERY_BLOCK_SIZE]
+            block = self._scores(block_queries)
+            top = np.argpartition(-block, candidates - 1, axis=1)[:, :candidates]
+            if rerank:
+                # Exact scores for the candidates only, read from the float32 copy
+                top_scores = np.einsum('qd,qcd->qc', block_queries, self.full_vectors[top.ravel()].reshape(*top.shape, -1))
+            else:
+                top_scores = np.take_along_axis(block, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind='stable')[:, :top_k]
+            indices[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+            scores[start:start + len(block)] = np.take_along_axis(top_scores, order, axis=1)
+        return indices, scores
+
+    def query(self, vector, top_k=5):
+        return self.query_batch([vector], top_k)[0]
+
+    def query_batch(self, vectors, top_k=5, concurrency=1):
+        if len(self) == 0:
+            return [{'matches': []} for _ in vectors]
+        indices, scores = self.search(vectors, top_k)
+        return [
+            {'matches': [self._match(i, score) for i, score in zip(row_indices, row_scores)]}
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+
+
+class IVFRetriever(LocalRetriever):
+    """Approximate search with an inverted file index (IVF-Flat) built in-process.
+
+    The normalized vectors are clustered with spherical k-means into `nlist` lists. A query
+    only scores the vectors of its `nprobe` closest lists; raising nprobe trades speed for recall.
+    """
+
+    def __init__(self, vectors, filenames, ids, centroids, list_offsets, list_members, nprobe=8, directory=None):
+        super().__init__(vectors, filenames, ids, directory)
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_members = list_members
+        self.nprobe = nprobe
+
+    @classmethod
+    def build(cls, local, nlist=None, nprobe=8, iterations=10, sample_size=50000, seed=0):
+        vectors = local.float_vectors()
+        if len(vectors) == 0:
+            return cls(vectors, local.filenames, local.ids, np.empty((0, vectors.shape[1]), dtype=vectors.dtype),
+                       np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int64), nprobe, local.directory)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(len(vectors)))), len(vectors))
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(len(vectors), min(sample_size, len(vectors)), replace=False)]
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = assign_to_centroids(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            empty = np.bincount(assignment, minlength=nlist) == 0
+            # Re-seed empty lists so every centroid keeps covering part of the data
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        assignment = assign_to_centroids(vectors, centroids)
+        list_members = np.argsort(assignment, kind='stable')
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=nlist))])
+        return cls(vectors, local.filenames, local.ids, centroids, list_offsets, list_members, nprobe, local.directory)
+
+    def candidates(self, query):
+        nprobe = min(self.nprobe, len(self.centroids))
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.concatenate([self.list_members[self.list_offsets[i]:self.list_offsets[i + 1]] for i in lists])
+
+    def search(self, vectors, top_k=5):
+        queries = normalize_rows(np.atleast_2d(vectors))
+        top_k = min(top_k, len(self))
+        indices = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+        if top_k == 0:
+            return indices, scores
+        for row, query in enumerate(queries):
+            candidates = self.candidates(query)
+            candidate_scores = self.vectors[candidates] @ query
+            k = min(top_k, len(candidates))
+            if k == 0:
+                # Every probed list is empty; the row stays at -1 and is dropped by query_batch
+                continue
+            top = np.argpartition(-candidate_scores, k - 1)[:k]
+            top = top[np.argsort(-candidate_scores[top], kind='stable')]
+            indices[row, :k] = candidates[top]
+            scores[row, :k] = candidate_scores[top]
+        return indices, scores
+
+    def query_batch(self, vectors, top_k=5, concurrency=1):
+        indices, scores = self.search(vectors, top_k)
+        return [
+            {'matches': [self._match(i, score) for i, score in zip(row_indices, row_scores) if i >= 0]}
+            for row_indices, row_scores in zip(indices, scores)
+        ]
+
+
+def assign_to_centroids(vectors, centroids, block_size=4096):
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        assignment[start:start + block_size] = np.argmax(vectors[start:start + block_size] @ centroids.T, axis=1)
+    return assignment
+
+
+def rank_matches(correct_filenames, query_results, top_k=10):
+    """Vectorized rank (1-based, 0 when missing) and score of the first match for the correct filename."""
+    filenames = np.full((len(query_results), top_k), None, dtype=object)
+    scores = np.zeros((len(query_results), top_k))
+    for row, query_result in enumerate(query_results):
+        matches = query_result['matches'][:top_k]
+        filenames[row, :len(matches)] = [m['metadata']['filename'] for m in matches]
+        scores[row, :len(matches)] = [m['score'] for m in matches]
+
+    hits = filenames == np.array(correct_filenames, dtype=object)[:, None]
+    found = hits.any(axis=1)
+    first = hits.argmax(axis=1)
+    ranks = np.where(found, first + 1, 0)
+    best_scores = np.where(found, scores[np.arange(len(query_results)), first], 0.0)
+    return ranks, best_scores
+
+
+def create_retriever(backend, index_name=None, directory=None, api_key=None, nlist=None, nprobe=8, rerank=0):
+    if backend == 'local':
+        return LocalRetriever.open(directory, rerank=rerank)
+    if backend == 'ivf':
+        return IVFRetriever.build(LocalRetriever.open(directory, mmap=False), nlist=nlist, nprobe=nprobe)
+    if backend == 'pinecone':
+        from pinecone.grpc import PineconeGRPC as Pinecone
+        return PineconeRetriever(Pinecone(api_key=api_key).Index(index_name))
+    raise ValueError(f"Unknown retriever backend: {backend}")
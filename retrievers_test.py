@@ -0,0 +1,173 @@
+import shutil
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from retrievers import IVFRetriever, LocalRetriever, PineconeRetriever, normalize_rows, rank_matches
+
+records = [
+    {'id': 'a', 'values': [1.0, 0.0, 0.0], 'metadata': {'filename': 'AAPL/2002/page_23.pdf'}},
+    {'id': 'b', 'values': [0.0, 2.0, 0.0], 'metadata': {'filename': 'UPS/2009/page_33.pdf'}},
+    {'id': 'c', 'values': [1.0, 1.0, 0.0], 'metadata': {'filename': 'UPS/2009/page_33.pdf'}},
+]
+
+
+class TestLocalRetriever(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_query_returns_top_k_by_cosine(self):
+        retriever = LocalRetriever.open(self.directory)
+        retriever.upsert(records)
+        result = retriever.query([0.9, 0.1, 0.0], top_k=2)
+        self.assertEqual([m['id'] for m in result['matches']], ['a', 'c'])
+        self.assertAlmostEqual(result['matches'][0]['score'], 0.9 / np.hypot(0.9, 0.1), places=5)
+        self.assertEqual(result['matches'][1]['metadata']['filename'], 'UPS/2009/page_33.pdf')
+
+    def test_saved_index_is_memory_mapped(self):
+        LocalRetriever.open(self.directory).upsert(records)
+        retriever = LocalRetriever.open(self.directory)
+        self.assertIsInstance(retriever.vectors, np.memmap)
+        self.assertEqual(len(retriever), 3)
+        np.testing.assert_allclose(np.linalg.norm(retriever.vectors, axis=1), 1.0, rtol=1e-6)
+        self.assertEqual(retriever.query([0.0, 1.0, 0.0], top_k=1)['matches'][0]['id'], 'b')
+
+    def test_upsert_replaces_existing_ids(self):
+        retriever = LocalRetriever.open(self.directory)
+        retriever.upsert(records)
+        retriever.upsert([{'id': 'a', 'values': [0.0, 0.0, 1.0], 'metadata': {'filename': 'new.pdf'}}])
+        self.assertEqual(len(retriever), 3)
+        match = retriever.query([0.0, 0.0, 1.0], top_k=1)['matches'][0]
+        self.assertEqual((match['id'], match['metadata']['filename']), ('a', 'new.pdf'))
+
+    def test_empty_index(self):
+        self.assertEqual(LocalRetriever.open(self.directory).query([1.0, 0.0, 0.0]), {'matches': []})
+
+    def test_quantized_index_is_saved_and_reopened(self):
+        for dtype in ('float16', 'int8'):
+            directory = f"{self.directory}/{dtype}"
+            LocalRetriever.open(directory, dtype=dtype).upsert(records)
+            retriever = LocalRetriever.open(directory)
+            self.assertEqual(retriever.dtype, dtype)
+            self.assertEqual(retriever.scales is not None, dtype == 'int8')
+            result = retriever.query([0.9, 0.1, 0.0], top_k=2)
+            self.assertEqual([m['id'] for m in result['matches']], ['a', 'c'])
+            self.assertAlmostEqual(result['matches'][0]['score'], 0.9 / np.hypot(0.9, 0.1), places=2)
+
+    def test_open_converts_to_requested_dtype(self):
+        LocalRetriever.open(self.directory).upsert(records)
+        retriever = LocalRetriever.open(self.directory, dtype='int8')
+        self.assertEqual(retriever.dtype, 'int8')
+        self.assertEqual(retriever.memory_bytes(), 3 * 3 + 3 * 4)
+        retriever.delete(['b'])
+        self.assertEqual(LocalRetriever.open(self.directory).dtype, 'int8')
+        self.assertEqual(len(LocalRetriever.open(self.directory)), 2)
+
+    def test_rerank_returns_exact_scores(self):
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(500, 64))
+        many = [{'id': str(i), 'values': vector.tolist(), 'metadata': {'filename': f'doc_{i}'}}
+                for i, vector in enumerate(vectors)]
+        exact = LocalRetriever.open(f"{self.directory}/exact")
+        exact.upsert(many)
+        LocalRetriever.open(self.directory, dtype='int8', rerank=4).upsert(many)
+        reranked = LocalRetriever.open(self.directory, rerank=4)
+        self.assertIsInstance(reranked.full_vectors, np.memmap)
+
+        queries = vectors[:20] + 0.5 * rng.normal(size=(20, 64))
+        exact_indices, exact_scores = exact.search(queries, 5)
+        indices, scores = reranked.search(queries, 5)
+        np.testing.assert_array_equal(indices, exact_indices)
+        np.testing.assert_allclose(scores, exact_scores, rtol=1e-5)
+
+
+    def test_rerank_needs_the_float32_vectors(self):
+        LocalRetriever.open(self.directory, dtype='int8').upsert(records)
+        with self.assertWarns(UserWarning):
+            retriever = LocalRetriever.open(self.directory, rerank=4)
+        self.assertEqual(retriever.rerank, 0)
+        self.assertIsNone(retriever.full_vectors)
+        # A float32 index holds the exact vectors, so converting it keeps them for re-ranking
+        LocalRetriever.open(f"{self.directory}/exact").upsert(records)
+        retriever = LocalRetriever.open(f"{self.directory}/exact", dtype='int8', rerank=4)
+        self.assertEqual(retriever.rerank, 4)
+        np.testing.assert_allclose(retriever.full_vectors, normalize_rows(np.array([r['values'] for r in records])),
+                                   rtol=1e-6)
+
+class TestIVFRetriever(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        centers = rng.normal(size=(20, 32))
+        vectors = centers[rng.integers(0, 20, 2000)] + 0.1 * rng.normal(size=(2000, 32))
+        self.exact = LocalRetriever(normalize_rows(vectors), np.array([f'doc_{i}' for i in range(2000)]),
+                                    np.array([str(i) for i in range(2000)]))
+        self.queries = centers[rng.integers(0, 20, 50)] + 0.1 * rng.normal(size=(50, 32))
+
+    def test_probing_every_list_is_exact(self):
+        ivf = IVFRetriever.build(self.exact, nlist=16, nprobe=16)
+        exact_indices, _ = self.exact.search(self.queries, 10)
+        ivf_indices, _ = ivf.search(self.queries, 10)
+        np.testing.assert_array_equal(ivf_indices, exact_indices)
+
+    def test_recall_on_clustered_data(self):
+        ivf = IVFRetriever.build(self.exact, nlist=32, nprobe=4)
+        exact_indices, _ = self.exact.search(self.queries, 10)
+        ivf_indices, _ = ivf.search(self.queries, 10)
+        recall = np.mean([len(set(a) & set(b)) / 10 for a, b in zip(exact_indices, ivf_indices)])
+        self.assertGreater(recall, 0.9)
+
+    def test_query_shape_matches_local_retriever(self):
+        ivf = IVFRetriever.build(self.exact, nlist=8, nprobe=2)
+        result = ivf.query(self.queries[0], top_k=3)
+        self.assertEqual(len(result['matches']), 3)
+        self.assertEqual(set(result['matches'][0]), {'id', 'score', 'metadata'})
+
+
+    def test_empty_index(self):
+        directory = tempfile.mkdtemp()
+        try:
+            ivf = IVFRetriever.build(LocalRetriever.open(directory))
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(ivf.query([1.0, 0.0, 0.0]), {'matches': []})
+
+    def test_empty_probed_lists(self):
+        # Both vectors sit in the first list; the query only probes the second, empty one
+        vectors = normalize_rows(np.array([[1.0, 0.0], [1.0, 0.1]]))
+        ivf = IVFRetriever(vectors, np.array(['a.pdf', 'b.pdf']), np.array(['a', 'b']), np.eye(2),
+                           np.array([0, 2, 2]), np.array([0, 1]), nprobe=1)
+        self.assertEqual(ivf.query([0.0, 1.0], top_k=2), {'matches': []})
+        self.assertEqual(len(ivf.query([1.0, 0.0], top_k=2)['matches']), 2)
+
+class TestRankMatches(unittest.TestCase):
+
+    def test_rank_matches(self):
+        query_results = [
+            {'matches': [{'metadata': {'filename': 'UPS/2009/page_33.pdf'}, 'score': 0.8},
+                         {'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.7}]},
+            {'matches': [{'metadata': {'filename': 'AAPL/2002/page_23.pdf'}, 'score': 0.6}]},
+            {'matches': []},
+        ]
+        ranks, scores = rank_matches(
+            ['AAPL/2002/page_23.pdf', 'UPS/2009/page_33.pdf', 'UPS/2009/page_33.pdf'], query_results)
+        self.assertEqual(ranks.tolist(), [2, 0, 0])
+        self.assertEqual(scores.tolist(), [0.7, 0.0, 0.0])
+
+
+class TestPineconeRetriever(unittest.TestCase):
+
+    def test_upsert_in_batches(self):
+        index = MagicMock()
+        PineconeRetriever(index).upsert([records[0]] * 500)
+        self.assertEqual([len(call.kwargs['vectors']) for call in index.upsert.call_args_list], [240, 240, 20])
+
+
+if __name__ == '__main__':
+    unittest.main()
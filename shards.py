@@ -0,0 +1,145 @@
+"""Splits the questions into shards that generate_reports.py can process independently.
+
+    python generate_reports.py --shard 0/4          # on each CI runner or core, 0/4 .. 3/4
+    python shards.py merge --count 4                # writes reports/*.json from the shard results
+    python shards.py run --count 4 -- --concurrency 8   # both steps, one process per shard
+
+A question's shard only depends on its id, so every worker selects the same partition without
+coordinating. Each shard keeps its own checkpoints (reports/similarity_report.shard-0-of-4.jsonl
+and so on), so shards resume with --resume like a single run.
+"""
+import argparse
+import hashlib
+import os
+import subprocess
+import sys
+import time
+
+from checkpoint import Checkpoint, write_json_array
+from utils import load_records
+
+POLL_SECONDS = 0.5
+REPORTS = ('reports/similarity_report.jsonl', 'reports/llm_response_report.jsonl')
+
+
+def parse_shard(value):
+    """Parses 'i/n' (0 <= i < n) for argparse."""
+    try:
+        index, count = (int(part) for part in value.split('/'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/n, got {value!r}")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"shard index must be between 0 and {count - 1}, got {index}")
+    return index, count
+
+
+def shard_of(question_id, count):
+    """Stable across processes and Python versions, unlike hash()."""
+    digest = hashlib.blake2b(question_id.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') % count
+
+
+def select_shard(questions, index, count):
+    return [item for item in questions if shard_of(item['id'], count) == index]
+
+
+def shard_path(path, index, count):
+    """reports/similarity_report.jsonl -> reports/similarity_report.shard-0-of-4.jsonl"""
+    root, extension = os.path.splitext(path)
+    return f"{root}.shard-{index}-of-{count}{extension}"
+
+
+def merge(questions, count):
+    """Combines the shard checkpoints into reports/similarity_report.json and reports/llm_response_report.json.
+
+    Entries are written in the order of the questions file, as a single run would, and the LLM
+    report holds the questions whose rank is not 0. Returns the ids missing from the similarity
+    results (questions of shards that did not finish).
+    """
+    checkpoints = {}
+    for path in REPORTS:
+        shard_paths = [shard_path(path, index, count) for index in range(count)]
+        missing_files = [shard for shard in shard_paths if not os.path.exists(shard)]
+        if missing_files:
+            raise FileNotFoundError(f"No results for shards: {', '.join(missing_files)}")
+        checkpoints[path] = [Checkpoint(shard, resume=True) for shard in shard_paths]
+
+    question_ids = [item['id'] for item in questions]
+    shards = {question_id: shard_of(question_id, count) for question_id in question_ids}
+
+    def records(path, ids):
+        # One ordered stream per shard; walking the ids picks the next record from the right one
+        ids = list(ids)
+        shard_checkpoints = checkpoints[path]
+        streams = [checkpoint.records([question_id for question_id in ids if shards[question_id] == index])
+                   for index, checkpoint in enumerate(shard_checkpoints)]
+        for question_id in ids:
+            if question_id in shard_checkpoints[shards[question_id]]:
+                yield next(streams[shards[question_id]])
+
+    similarity_path, llm_path = REPORTS
+    relevant_ids = [item['id'] for item in records(similarity_path, question_ids) if item['rank'] != 0]
+    write_json_array(records(similarity_path, question_ids), 'reports/similarity_report.json')
+    write_json_array(records(llm_path, relevant_ids), 'reports/llm_response_report.json')
+    missing = [question_id for question_id in question_ids
+               if question_id not in checkpoints[similarity_path][shards[question_id]]]
+    for shard_checkpoints in checkpoints.values():
+        for checkpoint in shard_checkpoints:
+            checkpoint.close()
+    return missing
+
+
+def run_shards(count, report_args, workers=None):
+    """Runs generate_reports.py once per shard, at most `workers` at a time, and returns the failed shards.
+
+    The output of each shard goes to reports/generate_reports.shard-i-of-n.log.
+    """
+    workers = workers or count
+    os.makedirs('reports', exist_ok=True)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'generate_reports.py')
+    pending = list(range(count))
+    running = {}
+    failed = []
+    while pending or running:
+        while pending and len(running) < workers:
+            index = pending.pop(0)
+            log = open(shard_path('reports/generate_reports.log', index, count), 'w')
+            process = subprocess.Popen([sys.executable, script, '--shard', f"{index}/{count}", *report_args],
+                                       stdout=log, stderr=subprocess.STDOUT)
+            running[index] = (process, log)
+        time.sleep(POLL_SECONDS)
+        for index, (process, log) in list(running.items()):
+            if process.poll() is not None:
+                del running[index]
+                log.close()
+                if process.returncode != 0:
+                    failed.append(index)
+    return sorted(failed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run generate_reports.py in shards and merge their reports.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    merge_parser = subparsers.add_parser('merge', help="Combine the shard results into reports/*.json.")
+    run_parser = subparsers.add_parser('run', help="Run every shard in a local process, then merge.")
+    for subparser in (merge_parser, run_parser):
+        subparser.add_argument('--count', type=int, required=True, help="Number of shards.")
+        subparser.add_argument('--questions', default='data/questions.json')
+    run_parser.add_argument('--workers', type=int, default=None,
+                            help="Shards running at the same time (default: all of them).")
+    run_parser.add_argument('report_args', nargs=argparse.REMAINDER,
+                            help="Arguments passed to every generate_reports.py process, after --.")
+    args = parser.parse_args(argv)
+
+    if args.command == 'run':
+        report_args = args.report_args[1:] if args.report_args[:1] == ['--'] else args.report_args
+        failed = run_shards(args.count, ['--questions', args.questions, *report_args], args.workers)
+        if failed:
+            sys.exit(f"Shards {failed} failed, see reports/generate_reports.shard-*-of-{args.count}.log")
+    missing = merge(load_records(args.questions), args.count)
+    if missing:
+        print(f"{len(missing)} questions have no results yet, e.g. {missing[0]}")
+
+
+if __name__ == "__main__":
+    main()
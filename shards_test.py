@@ -0,0 +1,80 @@
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import shards
+from checkpoint import Checkpoint
+
+questions = [{"id": f"Single_DOC/{i}/page_1.pdf-{i}_qa", "question": f"q{i}"} for i in range(40)]
+
+
+class TestShards(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.previous_directory = os.getcwd()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        os.chdir(self.previous_directory)
+        shutil.rmtree(self.directory)
+
+    def test_parse_shard(self):
+        self.assertEqual(shards.parse_shard("1/4"), (1, 4))
+        for value in ("4/4", "-1/4", "1", "a/b"):
+            with self.assertRaises(argparse.ArgumentTypeError):
+                shards.parse_shard(value)
+
+    def test_shards_partition_the_questions(self):
+        selected = [shards.select_shard(questions, index, 3) for index in range(3)]
+        self.assertEqual(sorted(item['id'] for shard in selected for item in shard), sorted(item['id'] for item in questions))
+        self.assertTrue(all(shard for shard in selected))
+        # Fixed by the id alone, so every process and CI runner agrees
+        self.assertEqual(shards.shard_of("Single_AAPL/2002/page_23.pdf-1_qa", 1000), 999)
+        self.assertEqual(shards.shard_path('reports/similarity_report.jsonl', 0, 3),
+                         'reports/similarity_report.shard-0-of-3.jsonl')
+
+    def write_shard_results(self, count, skip_shard=None):
+        for index in range(count):
+            similarity = Checkpoint(shards.shard_path('reports/similarity_report.jsonl', index, count))
+            llm = Checkpoint(shards.shard_path('reports/llm_response_report.jsonl', index, count))
+            if index != skip_shard:
+                for item in reversed(shards.select_shard(questions, index, count)):
+                    rank = int(item['question'][1:]) % 3
+                    similarity.write({"question": item['question'], "rank": rank, "id": item['id']})
+                    if rank:
+                        llm.write({"question": item['question'], "answer": "1%", "id": item['id']})
+            similarity.close()
+            llm.close()
+
+    def test_merge_restores_question_order(self):
+        self.write_shard_results(3)
+        missing = shards.merge(questions, 3)
+        self.assertEqual(missing, [])
+        with open('reports/similarity_report.json') as file:
+            similarity = json.load(file)
+        with open('reports/llm_response_report.json') as file:
+            llm = json.load(file)
+        self.assertEqual([item['id'] for item in similarity], [item['id'] for item in questions])
+        self.assertEqual([item['id'] for item in llm], [item['id'] for item in similarity if item['rank'] != 0])
+
+    def test_merge_reports_unfinished_questions(self):
+        self.write_shard_results(3, skip_shard=1)
+        missing = shards.merge(questions, 3)
+        self.assertEqual(missing, [item['id'] for item in shards.select_shard(questions, 1, 3)])
+        with self.assertRaises(FileNotFoundError):
+            shards.merge(questions, 4)
+
+    def test_run_shards_starts_one_process_per_shard(self):
+        failed = shards.run_shards(2, ['--help'], workers=1)
+        self.assertEqual(failed, [])
+        for index in range(2):
+            with open(shards.shard_path('reports/generate_reports.log', index, 2)) as log:
+                self.assertIn("--shard", log.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,202 @@
+import re
+
+import numpy as np
+
+from bm25 import tokenize
+from chunk_store import display_text
+from evaluation import NUMBER_PATTERN, parse_number, relative_errors
+
+# Words too common in questions and row labels to tell rows apart
+STOP_WORDS = frozenset("a an and as at by for from in is of on or the to total was what were which".split())
+LETTER_PATTERN = re.compile(r"[a-z]", re.IGNORECASE)
+STEP_PATTERN = re.compile(r"(\w+)\(([^()]*)\)")
+
+
+def normalize_label(text):
+    return " ".join(str(text).lower().split()).strip(" :")
+
+
+def parse_cell(text):
+    """Numeric value of a table cell such as "$ 1,234", "( 56 )" or "12.5%", or nan for text cells."""
+    text = str(text)
+    match = NUMBER_PATTERN.search(text)
+    if not match or LETTER_PATTERN.search(text[:match.start()] + text[match.end():]):
+        return np.nan
+    return parse_number(match.group(0))[0]
+
+
+def terms(text):
+    return set(tokenize(text)) - STOP_WORDS
+
+
+class Table:
+    """One train.json table: the header row gives the columns, the first cell of every other row its label.
+
+    values holds the parsed cells as a (rows x columns) float array, nan where a cell is not a number.
+    """
+
+    def __init__(self, filename, rows):
+        self.filename = filename
+        header = list(rows[0]) if rows else []
+        self.corner = header[0] if header else ""
+        self.columns = header[1:]
+        self.labels = [row[0] if row else "" for row in rows[1:]]
+        self.cells = [(list(row[1:]) + [""] * len(self.columns))[:len(self.columns)] for row in rows[1:]]
+        self.values = np.array([[parse_cell(cell) for cell in cells] for cells in self.cells],
+                               dtype=float).reshape(len(self.labels), len(self.columns))
+
+    def row(self, label):
+        """Index of the first row with this label, or None."""
+        label = normalize_label(label)
+        return next((i for i, other in enumerate(self.labels) if normalize_label(other) == label), None)
+
+    def row_values(self, label):
+        """The numeric cells of a row, without the text ones."""
+        i = self.row(label)
+        if i is None:
+            return np.empty(0)
+        return self.values[i][~np.isnan(self.values[i])]
+
+    def relevant(self, question, max_rows=None):
+        """(rows, columns) sharing words with the question, in table order; all of them when none do.
+
+        Rows are ranked by the number of shared words and only the max_rows best are kept.
+        """
+        words = terms(question)
+        row_scores = np.array([len(words & terms(label)) for label in self.labels], dtype=int)
+        rows = np.flatnonzero(row_scores)
+        if rows.size == 0:
+            rows = np.arange(len(self.labels))
+        if max_rows is not None and rows.size > max_rows:
+            rows = np.sort(rows[np.argsort(-row_scores[rows], kind='stable')[:max_rows]])
+        columns = [j for j, header in enumerate(self.columns) if words & terms(header)]
+        return rows.tolist(), columns or list(range(len(self.columns)))
+
+    def render(self, rows=None, columns=None):
+        """Rows in the same "a | b | c" layout as chunk_store.display_text, header first."""
+        rows = range(len(self.labels)) if rows is None else rows
+        columns = range(len(self.columns)) if columns is None else columns
+        lines = [" | ".join([self.corner] + [self.columns[j] for j in columns])]
+        lines += [" | ".join([self.labels[i]] + [self.cells[i][j] for j in columns]) for i in rows]
+        return "\n".join(lines)
+
+
+class TableStore:
+    """Parsed tables of every filing, with numeric cells indexed by (filename, row label, column header)."""
+
+    def __init__(self, tables):
+        self.tables = {table.filename: table for table in tables}
+        self.index = {}
+        for table in self.tables.values():
+            for i, label in enumerate(table.labels):
+                for j, column in enumerate(table.columns):
+                    key = (table.filename, normalize_label(label), normalize_label(column))
+                    if not np.isnan(table.values[i, j]) and key not in self.index:
+                        self.index[key] = float(table.values[i, j])
+
+    @classmethod
+    def from_items(cls, items):
+        """Builds the store from train.json items or table chunks, i.e. dicts with 'filename' and 'table'."""
+        tables = {}
+        for item in items:
+            if item.get("table") and item["filename"] not in tables:
+                tables[item["filename"]] = Table(item["filename"], item["table"])
+        return cls(tables.values())
+
+    def __len__(self):
+        return len(self.tables)
+
+    def get(self, filename):
+        return self.tables.get(filename)
+
+    def lookup(self, filename, row, column):
+        """The number in the cell, or None when there is no such numeric cell."""
+        return self.index.get((filename, normalize_label(row), normalize_label(column)))
+
+    def display_text(self, chunk, question, max_rows=None):
+        """Like chunk_store.display_text, but a table chunk only shows the rows and columns relevant to question."""
+        table = self.tables.get(chunk["filename"]) if chunk.get("kind") == "table" else None
+        if table is None:
+            return display_text(chunk)
+        return table.render(*table.relevant(question, max_rows))
+
+
+def program_argument(argument, results):
+    argument = argument.strip()
+    if argument.startswith("#"):
+        return results[int(argument[1:])]
+    if argument.startswith("const_"):
+        constant = argument[len("const_"):]
+        return -1.0 if constant == "m1" else float(constant)
+    return parse_number(argument)[0]
+
+
+def execute_program(program, table=None):
+    """Evaluates a FinQA-style program such as "subtract(5829, 5735), divide(#0, 5735)".
+
+    Steps are add, subtract, multiply, divide, exp and greater on numbers, constants (const_100,
+    const_m1) and earlier results (#0), and table_sum/average/max/min over the numeric cells of
+    a row of table. Returns the result of the last step.
+    """
+    results = []
+    for operation, arguments in STEP_PATTERN.findall(program):
+        if operation.startswith("table_"):
+            label = arguments.split(",")[0].strip()
+            values = table.row_values(label) if table is not None else np.empty(0)
+            if values.size == 0:
+                raise KeyError(f"No numeric row {label!r} in the table")
+            results.append(float({"table_sum": np.sum, "table_average": np.mean,
+                                  "table_max": np.max, "table_min": np.min}[operation](values)))
+            continue
+        a, b = (program_argument(argument, results) for argument in arguments.split(","))
+        if operation == "add":
+            results.append(a + b)
+        elif operation == "subtract":
+            results.append(a - b)
+        elif operation == "multiply":
+            results.append(a * b)
+        elif operation == "divide":
+            results.append(a / b)
+        elif operation == "exp":
+            results.append(a ** b)
+        elif operation == "greater":
+            results.append(a > b)
+        else:
+            raise ValueError(f"Unknown program step: {operation}")
+    if not results:
+        raise ValueError(f"Empty program: {program!r}")
+    return results[-1]
+
+
+def verify_answer(answer, program, table=None, tolerance=3):
+    """Whether answer is within tolerance percent of the program's result, locally and without an LLM.
+
+    Ratios are also compared as percentages, so "14.1%" matches a result of 0.141.
+    """
+    result = execute_program(program, table)
+    if isinstance(result, (bool, np.bool_)):
+        return str(answer).strip().lower() == ("yes" if result else "no")
+    expected = [format(result, 'f'), format(result * 100, 'f')]
+    return bool(relative_errors([answer, answer], expected).min() <= tolerance)
+
+
+def check_programs(report, questions, store=None, tolerance=3):
+    """Re-runs the program of every reported question that has one, against its filing's table.
+
+    Counts the questions with a program, those whose expected answer and whose LLM answer match
+    the program's result, and the programs that could not be run (e.g. a missing table row).
+    """
+    programs = {item['id']: item for item in questions if item.get('program')}
+    counts = {"programs": 0, "expected": 0, "answers": 0, "failed": 0}
+    for item in report:
+        question = programs.get(item['id'])
+        if question is None:
+            continue
+        counts["programs"] += 1
+        table = store.get(question['filename']) if store is not None else None
+        try:
+            counts["expected"] += verify_answer(item['expectedAnswer'], question['program'], table, tolerance)
+            counts["answers"] += verify_answer(item['answer'], question['program'], table, tolerance)
+        except (KeyError, ValueError, IndexError, ZeroDivisionError):
+            counts["failed"] += 1
+    return counts
@@ -0,0 +1,75 @@
+import unittest
+
+import numpy as np
+
+from context_builder import build_chunk_context
+from chunk_store import ChunkStore
+from table_store import TableStore, execute_program, parse_cell, verify_answer
+
+table = [
+    ["", "2008", "2007", "2006"],
+    ["net sales", "$ 5,829", "$ 5,735", "$ 5,365"],
+    ["cost of sales", "( 3,870 )", "( 3,734 )", "( 3,560 )"],
+    ["gross margin", "33.6%", "34.9%", "n/a"],
+    ["operating income", "1,051", "1,041", "981"],
+]
+item = {"filename": "AAPL/2008/page_23.pdf", "table": table}
+
+
+class TestTableStore(unittest.TestCase):
+
+    def setUp(self):
+        self.store = TableStore.from_items([item])
+
+    def test_parse_cell(self):
+        self.assertEqual(parse_cell("$ 5,829"), 5829.0)
+        self.assertEqual(parse_cell("( 3,870 )"), -3870.0)
+        self.assertEqual(parse_cell("33.6%"), 33.6)
+        self.assertTrue(np.isnan(parse_cell("n/a")))
+        self.assertTrue(np.isnan(parse_cell("december 31 2008")))
+
+    def test_lookup_by_row_and_column(self):
+        self.assertEqual(self.store.lookup("AAPL/2008/page_23.pdf", "Net Sales", "2007"), 5735.0)
+        self.assertEqual(self.store.lookup("AAPL/2008/page_23.pdf", "cost of sales", "2006"), -3560.0)
+        self.assertIsNone(self.store.lookup("AAPL/2008/page_23.pdf", "gross margin", "2006"))
+        self.assertIsNone(self.store.lookup("MSFT/2008/page_1.pdf", "net sales", "2007"))
+
+    def test_relevant_rows_and_columns(self):
+        table = self.store.get("AAPL/2008/page_23.pdf")
+        question = "what was the percentage change in net sales from 2007 to 2008?"
+        self.assertEqual(table.relevant(question), ([0, 1], [0, 1]))
+        rows, columns = table.relevant(question, max_rows=1)
+        self.assertEqual((rows, columns), ([0], [0, 1]))
+        self.assertEqual(table.render(rows, columns), " | 2008 | 2007\nnet sales | $ 5,829 | $ 5,735")
+        # Nothing in common: the whole table
+        self.assertEqual(table.relevant("how did the company do?"), ([0, 1, 2, 3], [0, 1, 2]))
+        self.assertEqual(table.relevant("net sales, cost of sales and operating income", max_rows=2)[0], [0, 1])
+
+    def test_chunk_context_shows_only_relevant_rows(self):
+        chunks = ChunkStore([
+            {"id": "a#0", "filename": item["filename"], "text": "net sales grew in 2008", "position": 0, "kind": "text"},
+            {"id": "a#1", "filename": item["filename"], "text": "table", "position": 1, "kind": "table", "table": table},
+        ])
+        question = "what was the operating income in 2008?"
+        context = build_chunk_context([{"id": "a#0", "score": 0.9}], chunks,
+                                      render=lambda chunk: self.store.display_text(chunk, question))
+        self.assertEqual(context, "net sales grew in 2008\n | 2008\noperating income | 1,051")
+
+    def test_execute_program(self):
+        self.assertAlmostEqual(execute_program("subtract(5829, 5735), divide(#0, 5735)"), 94 / 5735)
+        self.assertAlmostEqual(execute_program("divide(5, const_100), multiply(#0, const_m1)"), -0.05)
+        self.assertTrue(execute_program("greater(5829, 5735)"))
+        self.assertEqual(execute_program("table_sum(net sales, none)", self.store.get(item["filename"])), 16929.0)
+        with self.assertRaises(KeyError):
+            execute_program("table_max(revenue, none)", self.store.get(item["filename"]))
+
+    def test_verify_answer(self):
+        program = "subtract(5829, 5735), divide(#0, 5735)"
+        self.assertTrue(verify_answer("1.6%", program))
+        self.assertTrue(verify_answer("0.0164", program))
+        self.assertFalse(verify_answer("2.5%", program))
+        self.assertTrue(verify_answer("yes", "greater(5829, 5735)"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+PERCENTILES = [50, 95, 99]
+
+
+class Span:
+    __slots__ = ('stage', 'start', 'counts')
+
+    def __init__(self, stage, start):
+        self.stage = stage
+        self.start = start
+        self.counts = {}
+
+
+class Tracer:
+    """Records the wall time of pipeline stages, with counters (retries, tokens, bytes) added while they run.
+
+    Spans nest per thread: counters added with add() go to every span open in the calling thread,
+    so a completion's tokens also count towards the get_llm_response span around it. Finished spans
+    are kept for summary() and, when path is given, appended to it as JSON Lines (start is in seconds
+    since the tracer was created).
+    """
+
+    def __init__(self, path=None, enabled=True, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.origin = clock()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.totals = {}
+        self.file = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(path, 'w', encoding='utf-8')
+
+    def _stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        return stack
+
+    def start(self, stage):
+        span = Span(stage, self.clock())
+        self._stack().append(span)
+        return span
+
+    def finish(self, span, error=None):
+        duration = self.clock() - span.start
+        self._stack().remove(span)
+        with self.lock:
+            self.durations.setdefault(span.stage, []).append(duration)
+            totals = self.totals.setdefault(span.stage, {})
+            for name, value in span.counts.items():
+                totals[name] = totals.get(name, 0) + value
+            if error is not None:
+                totals['errors'] = totals.get('errors', 0) + 1
+            if self.file:
+                record = {"stage": span.stage, "start": span.start - self.origin, "seconds": duration, **span.counts}
+                if error is not None:
+                    record["error"] = type(error).__name__
+                self.file.write(json.dumps(record) + "\n")
+
+    def add(self, **counts):
+        for span in self._stack():
+            for name, value in counts.items():
+                span.counts[name] = span.counts.get(name, 0) + value
+
+    def summary(self):
+        """Per stage: count, total seconds, p50/p95/p99 latency in milliseconds and summed counters."""
+        with self.lock:
+            result = {}
+            for stage, durations in self.durations.items():
+                durations = np.array(durations)
+                result[stage] = {
+                    "count": len(durations),
+                    "total_seconds": float(durations.sum()),
+                    **{f"p{p}_ms": float(value) * 1000 for p, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES))},
+                    **self.totals[stage],
+                }
+            return result
+
+    def close(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+# Disabled until configure_tracing() is called, so instrumented functions cost one attribute check
+tracer = Tracer(enabled=False)
+
+
+def configure_tracing(path=None):
+    global tracer
+    tracer = Tracer(path)
+    return tracer
+
+
+def add(**counts):
+    if tracer.enabled:
+        tracer.add(**counts)
+
+
+@contextlib.contextmanager
+def span(stage):
+    """Records the enclosed block as a span named stage."""
+    current = tracer
+    if not current.enabled:
+        yield
+        return
+    started = current.start(stage)
+    try:
+        yield
+    except Exception as error:
+        current.finish(started, error)
+        raise
+    current.finish(started)
+
+
+def traced(stage):
+    """Decorator recording every call of the function as a span named stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def format_summary(summary):
+    lines = []
+    for stage, stats in summary.items():
+        counters = ", ".join(f"{name}={value}" for name, value in stats.items()
+                             if name not in ("count", "total_seconds", "p50_ms", "p95_ms", "p99_ms"))
+        lines.append(f"{stage}: {stats['count']} calls, {stats['total_seconds']:.2f}s total, "
+                     f"p50 {stats['p50_ms']:.1f}ms, p95 {stats['p95_ms']:.1f}ms, p99 {stats['p99_ms']:.1f}ms"
+                     + (f", {counters}" if counters else ""))
+    return "\n".join(lines)
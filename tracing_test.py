@@ -0,0 +1,87 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import tracing
+from rate_limiter import Scheduler
+from rate_limiter_test import FakeClock, StatusError, failing
+
+
+class TestTracer(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        tracing.tracer.close()
+        tracing.tracer = tracing.Tracer(enabled=False)
+        shutil.rmtree(self.directory)
+
+    def test_counters_go_to_all_open_spans(self):
+        tracer = tracing.Tracer(clock=self.clock)
+        outer = tracer.start("get_llm_response")
+        inner = tracer.start("get_response")
+        tracer.add(prompt_tokens=100)
+        self.clock.sleep(0.5)
+        tracer.finish(inner)
+        tracer.add(prompt_bytes=10)
+        tracer.finish(outer)
+        summary = tracer.summary()
+        self.assertEqual(summary["get_response"]["prompt_tokens"], 100)
+        self.assertNotIn("prompt_bytes", summary["get_response"])
+        self.assertEqual(summary["get_llm_response"]["prompt_tokens"], 100)
+        self.assertEqual(summary["get_llm_response"]["prompt_bytes"], 10)
+        self.assertAlmostEqual(summary["get_response"]["p50_ms"], 500.0)
+
+    def test_percentiles(self):
+        tracer = tracing.Tracer(clock=self.clock)
+        for milliseconds in range(1, 101):
+            span = tracer.start("vector_query")
+            self.clock.sleep(milliseconds / 1000)
+            tracer.finish(span)
+        stats = tracer.summary()["vector_query"]
+        self.assertEqual(stats["count"], 100)
+        self.assertAlmostEqual(stats["p50_ms"], 50.5)
+        self.assertAlmostEqual(stats["p99_ms"], 99.01)
+
+    def test_traced_functions_write_jsonl_and_record_retries(self):
+        path = os.path.join(self.directory, 'trace.jsonl')
+        tracer = tracing.configure_tracing(path)
+        scheduler = Scheduler(clock=self.clock, sleep=self.clock.sleep, jitter=lambda low, high: high)
+
+        @tracing.traced("get_response")
+        def get_response():
+            return scheduler.call(failing([StatusError(429), StatusError(500)]))
+
+        @tracing.traced("get_embedding")
+        def get_embedding():
+            raise ValueError("bad input")
+
+        self.assertEqual(get_response(), "ok")
+        with self.assertRaises(ValueError):
+            get_embedding()
+        tracer.close()
+
+        with open(path, encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual([record["stage"] for record in records], ["get_response", "get_embedding"])
+        self.assertEqual(records[0]["retries"], 2)
+        self.assertEqual(records[0]["rate_limited"], 1)
+        self.assertEqual(records[1]["error"], "ValueError")
+        self.assertEqual(tracer.summary()["get_embedding"]["errors"], 1)
+
+    def test_disabled_tracer_records_nothing(self):
+        @tracing.traced("get_embedding")
+        def get_embedding():
+            tracing.add(prompt_tokens=1)
+            return [0.5]
+
+        self.assertEqual(get_embedding(), [0.5])
+        self.assertEqual(tracing.tracer.summary(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,21 @@
 import json
+import os
+
+from cache import EmbeddingCache
+from rate_limiter import openai_scheduler
+import tracing
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# text-embedding-3 models can return shorter vectors (e.g. 256 or 512); unset keeps the full 1536
+EMBEDDING_DIMENSIONS = int(os.getenv('EMBEDDING_DIMENSIONS', '0')) or None
+# The embeddings endpoint accepts up to 2048 inputs and 300k tokens per request
+EMBEDDING_BATCH_SIZE = 1000
+EMBEDDING_BATCH_TOKENS = 250000
+EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', '.cache/embeddings.sqlite')
+EMBEDDING_CACHE_MAX_MB = int(os.getenv('EMBEDDING_CACHE_MAX_MB', '2048'))
+
+# Shared by get_embedding and get_embeddings once configure_embedding_cache has been called
+embedding_cache = None
 
 def load_json(file_path):
     with open(file_path, 'r') as file:
@@ -11,6 +28,92 @@ def load_json_opt(file_path):
     except FileNotFoundError:
         return None
 
+def create_openai_client(api_key=None):
+    # Imported here because the openai package alone takes most of the start-up time
+    from openai import OpenAI
+    # Retries are handled by rate_limiter.openai_scheduler
+    return OpenAI(api_key=api_key, max_retries=0)
+
+def load_records(file_path):
+    """Loads a list of records from a JSON array, JSON Lines (.jsonl) or a record store (.records)."""
+    if file_path.endswith('.records'):
+        from record_store import RecordStore
+        store = RecordStore(file_path)
+        try:
+            return list(store)
+        finally:
+            store.close()
+    if file_path.endswith('.jsonl'):
+        with open(file_path, 'r', encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+    return load_json(file_path)
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token), used only to size batches."""
+    return len(text) // 4 + 1
+
+def batch_by_budget(texts, batch_size=EMBEDDING_BATCH_SIZE, max_tokens=EMBEDDING_BATCH_TOKENS):
+    """Yields lists of indices into texts, each within batch_size inputs and max_tokens estimated tokens."""
+    batch = []
+    batch_tokens = 0
+    for i, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if batch and (len(batch) >= batch_size or batch_tokens + tokens > max_tokens):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(i)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def embed_batch(texts, client, model=EMBEDDING_MODEL, dimensions=None):
+    """Embeds a list of texts in one request, halving the batch when the API rejects it as too large."""
+    options = {'dimensions': dimensions} if dimensions else {}
+    try:
+        response = openai_scheduler.call(client.embeddings.create, input=texts, model=model,
+                                         tokens=sum(estimate_tokens(text) for text in texts), **options)
+    except Exception as error:
+        if getattr(error, 'status_code', None) != 400 or len(texts) == 1:
+            raise
+        middle = len(texts) // 2
+        return embed_batch(texts[:middle], client, model, dimensions) + embed_batch(texts[middle:], client, model, dimensions)
+    usage = getattr(response, 'usage', None)
+    tracing.add(requests=1, input_bytes=sum(len(text.encode('utf-8')) for text in texts),
+                prompt_tokens=getattr(usage, 'prompt_tokens', None) or 0)
+    return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+def configure_embedding_cache(path=EMBEDDING_CACHE_PATH, max_mb=EMBEDDING_CACHE_MAX_MB):
+    """Opens the on-disk embedding cache; an empty path disables caching."""
+    global embedding_cache
+    embedding_cache = EmbeddingCache(path, max_mb * 1024 ** 2) if path else None
+    return embedding_cache
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+def embedding_cache_model(model, dimensions=None):
+    """Cache namespace of a model; vectors of different lengths must not be served for each other."""
+    return f"{model}:{dimensions}" if dimensions else model
+
+def get_embeddings(texts, client, batch_size=EMBEDDING_BATCH_SIZE, max_tokens=EMBEDDING_BATCH_TOKENS, model=EMBEDDING_MODEL,
+                   dimensions=EMBEDDING_DIMENSIONS):
+    """Embeds texts with as few requests as possible and returns the vectors in input order."""
+    texts = [normalize_text(text) for text in texts]
+    cache = embedding_cache
+    cache_model = embedding_cache_model(model, dimensions)
+    embeddings = cache.get_embeddings(texts, cache_model) if cache else [None] * len(texts)
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    missing_texts = [texts[i] for i in missing]
+    for batch in batch_by_budget(missing_texts, batch_size, max_tokens):
+        batch_texts = [missing_texts[i] for i in batch]
+        batch_embeddings = embed_batch(batch_texts, client, model, dimensions)
+        for i, embedding in zip(batch, batch_embeddings):
+            embeddings[missing[i]] = embedding
+        if cache:
+            cache.put_embeddings(batch_texts, batch_embeddings, cache_model)
+    return embeddings
+
+@tracing.traced("get_embedding")
 def get_embedding(text, client):
-   text = text.replace("\n", " ")
-   return client.embeddings.create(input = [text], model="text-embedding-3-small").data[0].embedding
+    return get_embeddings([text], client)[0]
@@ -0,0 +1,65 @@
+import unittest
+from types import SimpleNamespace
+
+from utils import batch_by_budget, get_embeddings
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class FakeEmbeddingsClient:
+    def __init__(self, max_inputs=None):
+        self.max_inputs = max_inputs
+        self.calls = []
+        self.dimensions = []
+        self.embeddings = self
+
+    def create(self, input, model, dimensions=None):
+        self.calls.append(list(input))
+        self.dimensions.append(dimensions)
+        if self.max_inputs is not None and len(input) > self.max_inputs:
+            raise BadRequest("too many tokens")
+        # Return items out of order to make sure callers sort by index
+        data = [SimpleNamespace(index=i, embedding=[float(len(text))]) for i, text in enumerate(input)]
+        return SimpleNamespace(data=list(reversed(data)))
+
+
+class TestEmbeddingBatches(unittest.TestCase):
+
+    def test_batch_by_budget_respects_size(self):
+        batches = list(batch_by_budget(["a"] * 5, batch_size=2, max_tokens=100))
+        self.assertEqual(batches, [[0, 1], [2, 3], [4]])
+
+    def test_batch_by_budget_respects_tokens(self):
+        texts = ["x" * 40, "x" * 40, "x" * 4]
+        batches = list(batch_by_budget(texts, batch_size=10, max_tokens=15))
+        self.assertEqual(batches, [[0], [1, 2]])
+
+    def test_get_embeddings_keeps_input_order(self):
+        client = FakeEmbeddingsClient()
+        texts = ["a", "bb", "ccc", "dddd\nx"]
+        result = get_embeddings(texts, client, batch_size=3)
+        self.assertEqual(result, [[1.0], [2.0], [3.0], [6.0]])
+        self.assertEqual(len(client.calls), 2)
+        self.assertEqual(client.calls[1], ["dddd x"])
+
+    def test_get_embeddings_splits_rejected_batches(self):
+        client = FakeEmbeddingsClient(max_inputs=1)
+        result = get_embeddings(["a", "bb", "ccc"], client)
+        self.assertEqual(result, [[1.0], [2.0], [3.0]])
+
+    def test_get_embeddings_raises_for_single_rejected_input(self):
+        client = FakeEmbeddingsClient(max_inputs=0)
+        with self.assertRaises(BadRequest):
+            get_embeddings(["a"], client)
+
+    def test_get_embeddings_requests_reduced_dimensions(self):
+        client = FakeEmbeddingsClient()
+        get_embeddings(["a"], client)
+        get_embeddings(["a"], client, dimensions=256)
+        self.assertEqual(client.dimensions, [None, 256])
+
+
+if __name__ == '__main__':
+    unittest.main()